@@ -2,6 +2,41 @@ import cv2
 import numpy as np
 from PIL import Image, ImageDraw
 import os
+import shutil
+from functools import lru_cache
+
+
+@lru_cache(maxsize=8)
+def _circle_mask(circle_size):
+    """按直径缓存的圆形遮罩（L模式，圆内255），调用方不得修改"""
+    mask = Image.new('L', (circle_size, circle_size), 0)
+    ImageDraw.Draw(mask).ellipse([(0, 0), (circle_size, circle_size)], fill=255)
+    return mask
+
+
+@lru_cache(maxsize=8)
+def _corner_fill_mask(circle_size):
+    """右下角28*60矩形与圆形的交集（布尔数组），调用方不得修改"""
+    right_x = circle_size - 1  # 最右边的像素
+    bottom_y = circle_size - 1  # 最下边的像素
+    left_x = max(0, right_x - 28 + 1)  # 左边界
+    top_y = max(0, bottom_y - 60 + 1)  # 上边界
+    
+    fill = np.zeros((circle_size, circle_size), dtype=bool)
+    fill[top_y:bottom_y + 1, left_x:right_x + 1] = True
+    fill &= np.asarray(_circle_mask(circle_size)) == 255
+    fill.flags.writeable = False
+    return fill
+
+
+@lru_cache(maxsize=8)
+def _blank_circle_rgba(circle_size):
+    """空白RGBA底图（RGB为0，透明度为圆形遮罩），调用方需copy后使用"""
+    blank = np.zeros((circle_size, circle_size, 4), dtype=np.uint8)
+    blank[:, :, 3] = np.asarray(_circle_mask(circle_size))
+    blank.flags.writeable = False
+    return blank
+
 
 class ScreenshotCutter:
     """游戏截图切割工具，仅支持固定坐标切割方式"""
@@ -40,78 +75,61 @@ class ScreenshotCutter:
             outline='red', width=3
         )
         
-        # 创建透明背景的RGBA图像
-        circle_img_rgba = Image.new('RGBA', (circle_size, circle_size), (0, 0, 0, 0))
-        
         # 计算圆形区域的边界
         left = max(0, center_x - radius)
         top = max(0, center_y - radius)
         right = min(img_width, center_x + radius)
         bottom = min(img_height, center_y + radius)
         
-        # 切割原图中的圆形区域
+        # 切割原图中的圆形区域（已是RGB时不再convert，省去一次整图拷贝）
         crop_region = img.crop((left, top, right, bottom))
+        if crop_region.mode != 'RGB':
+            crop_region = crop_region.convert('RGB')
+        crop_region = np.asarray(crop_region)
         
         # 计算在新图像中的粘贴位置
         paste_x = (circle_size - (right - left)) // 2
         paste_y = (circle_size - (bottom - top)) // 2
         
-        # 将切割区域粘贴到透明背景上
-        circle_img_rgba.paste(crop_region, (paste_x, paste_y))
-        
-        # 创建圆形遮罩
-        mask = Image.new('L', (circle_size, circle_size), 0)
-        mask_draw = ImageDraw.Draw(mask)
-        mask_draw.ellipse([(0, 0), (circle_size, circle_size)], fill=255)
-        
-        # 应用遮罩，使圆形外部透明
-        circle_img_rgba.putalpha(mask)
-        
-        # 创建一个副本用于处理右下角区域（保留透明度）
-        circle_img_processed = circle_img_rgba.copy()
-        draw = ImageDraw.Draw(circle_img_processed)
-        
-        # 创建圆形遮罩，确保黑色矩形只在圆形内部
-        circle_mask = Image.new('L', (circle_size, circle_size), 0)
-        mask_draw = ImageDraw.Draw(circle_mask)
-        mask_draw.ellipse([(0, 0), (circle_size, circle_size)], fill=255)
-        
-        # 创建临时图像用于绘制黑色矩形
-        temp_img = Image.new('RGBA', (circle_size, circle_size), (0, 0, 0, 0))
-        temp_draw = ImageDraw.Draw(temp_img)
-        
-        # 将右下角28*60像素区域设置为黑色（避免影响后续匹配）
-        # 从右下角开始计算位置
-        right_x = circle_size - 1  # 最右边的像素
-        bottom_y = circle_size - 1  # 最下边的像素
-        left_x = right_x - 28 + 1  # 左边界
-        top_y = bottom_y - 60 + 1  # 上边界
-        
-        # 确保坐标在有效范围内
-        left_x = max(0, left_x)
-        top_y = max(0, top_y)
-        
-        # 在临时图像上绘制紫色矩形 (57, 34, 42)
-        temp_draw.rectangle([(left_x, top_y), (right_x, bottom_y)], fill=(57, 34, 42, 255))
-        
-        # 使用圆形遮罩将黑色矩形限制在圆形内
-        # 将临时图像合成到圆形图像上，但只在圆形区域内
-        for y in range(circle_size):
-            for x in range(circle_size):
-                if circle_mask.getpixel((x, y)) == 255:  # 在圆形内
-                    pixel = temp_img.getpixel((x, y))
-                    if pixel[3] > 0:  # 如果临时图像的该像素不透明
-                        circle_img_processed.putpixel((x, y), pixel)
+        # 在一个RGBA数组中一次完成：粘贴切割区域、圆形遮罩作为透明度、右下角填充
+        # 底图（含透明度通道）按尺寸缓存，每次只需一次连续拷贝
+        circle_pixels = _blank_circle_rgba(circle_size).copy()
+        circle_pixels[paste_y:paste_y + crop_region.shape[0], paste_x:paste_x + crop_region.shape[1], :3] = crop_region
+        
+        # 将右下角28*60像素区域（限制在圆形内部）设置为紫色 (57, 34, 42)，避免影响后续匹配
+        circle_pixels[_corner_fill_mask(circle_size)] = (57, 34, 42, 255)
         
         # 使用RGBA图像作为最终结果（保留透明度）
-        circle_img = circle_img_processed
+        circle_img = Image.fromarray(circle_pixels, 'RGBA')
         
         return img_with_circle, circle_img
     
+    @staticmethod
+    def _save_jpeg(img, paths):
+        """将图像以JPEG(quality=95)保存到一个或多个路径
+        
+        RGBA图像先合成到白色背景；只编码一次，其余路径复制已写出的文件（字节相同），
+        与第一个路径相同的路径直接跳过
+        """
+        if not paths:
+            return
+        
+        # 确保图像是RGB模式，不是RGBA
+        if img.mode == 'RGBA':
+            rgb_img = Image.new('RGB', img.size, (255, 255, 255))
+            rgb_img.paste(img, mask=img.getchannel('A'))
+            img = rgb_img
+        
+        first_path = paths[0]
+        img.save(first_path, format='JPEG', quality=95)
+        for path in paths[1:]:
+            if os.path.abspath(path) != os.path.abspath(first_path):
+                shutil.copyfile(first_path, path)
+    
     @staticmethod
     def cut_fixed(screenshot_path, output_folder, grid=(5, 2), item_width=210, item_height=160,
                  margin_left=10, margin_top=275, h_spacing=15, v_spacing=20, draw_circle=True,
-                 save_original=True, marker_output_folder=None):
+                 save_original=True, marker_output_folder=None, create_dirs=True):
         """按固定坐标切割游戏截图中的装备
         
         适用于装备位置固定的截图，如按网格排列的背包界面
@@ -129,15 +147,17 @@ class ScreenshotCutter:
             draw_circle: 是否在切割后的图片上绘制圆形，默认为True
             save_original: 是否保存原图，默认为True
             marker_output_folder: 带圆形标记副本的保存目录，如果为None则不保存副本
+            create_dirs: 是否创建输出目录，批量调用且调用方已创建目录时可设为False
         """
         try:
             with Image.open(screenshot_path) as img:
-                # 创建输出目录
-                os.makedirs(output_folder, exist_ok=True)
-                
-                # 创建标记副本目录（如果指定）
-                if marker_output_folder:
-                    os.makedirs(marker_output_folder, exist_ok=True)
+                if create_dirs:
+                    # 创建输出目录
+                    os.makedirs(output_folder, exist_ok=True)
+                    
+                    # 创建标记副本目录（如果指定）
+                    if marker_output_folder:
+                        os.makedirs(marker_output_folder, exist_ok=True)
                 
                 cols, rows = grid
                 total_items = cols * rows
@@ -166,56 +186,27 @@ class ScreenshotCutter:
                             # 在切割后的图片上绘制圆形并获取圆形区域
                             img_with_circle, circle_region = ScreenshotCutter.draw_circle_on_image(crop_img, 116)
                             
-                            # 如果指定了标记副本目录，先保存第一次处理的图片（带圆形标记）
+                            # 带圆形标记的图片：先保存到标记副本目录（如果指定），再按参数保存到主目录
+                            jpeg_paths = []
                             if marker_output_folder:
-                                marker_path = os.path.join(marker_output_folder, f"item_{row}_{col}.jpg")
-                                # 确保图像是RGB模式，不是RGBA
-                                if img_with_circle.mode == 'RGBA':
-                                    rgb_img = Image.new('RGB', img_with_circle.size, (255, 255, 255))
-                                    rgb_img.paste(img_with_circle, mask=img_with_circle.split()[-1])
-                                    rgb_img.save(marker_path, format='JPEG', quality=95)
-                                else:
-                                    img_with_circle.save(marker_path, format='JPEG', quality=95)
-                            
-                            # 根据参数决定保存内容到主目录
+                                jpeg_paths.append(os.path.join(marker_output_folder, f"item_{row}_{col}.jpg"))
                             if save_original:
-                                # 保存带圆形标记的原图到主目录（第二次处理）
-                                crop_path = os.path.join(output_folder, f"item_{row}_{col}.jpg")
-                                # 确保图像是RGB模式，不是RGBA
-                                if img_with_circle.mode == 'RGBA':
-                                    rgb_img = Image.new('RGB', img_with_circle.size, (255, 255, 255))
-                                    rgb_img.paste(img_with_circle, mask=img_with_circle.split()[-1])
-                                    rgb_img.save(crop_path, format='JPEG', quality=95)
-                                else:
-                                    img_with_circle.save(crop_path, format='JPEG', quality=95)
+                                jpeg_paths.append(os.path.join(output_folder, f"item_{row}_{col}.jpg"))
+                            ScreenshotCutter._save_jpeg(img_with_circle, jpeg_paths)
                             
                             # 保存圆形区域为PNG格式（保留透明度）
                             circle_path = os.path.join(output_folder, f"item_{row}_{col}_circle.png")
-                            # 直接保存为PNG格式，保留透明度
-                            circle_region.save(circle_path, format='PNG')
+                            # 直接保存为PNG格式，保留透明度；中间产物使用最低zlib压缩级别，
+                            # 像素无损不变，只换取更快的编码（文件略大）
+                            circle_region.save(circle_path, format='PNG', compress_level=1)
                             
                             # 注意：marker目录不保存圆形区域文件，只保存完整的带圆形标记的图片
                         else:
-                            # 只保存原图
-                            crop_path = os.path.join(output_folder, f"item_{row}_{col}.jpg")
-                            # 确保图像是RGB模式，不是RGBA
-                            if crop_img.mode == 'RGBA':
-                                rgb_img = Image.new('RGB', crop_img.size, (255, 255, 255))
-                                rgb_img.paste(crop_img, mask=crop_img.split()[-1])
-                                rgb_img.save(crop_path, format='JPEG', quality=95)
-                            else:
-                                crop_img.save(crop_path, format='JPEG', quality=95)
-                            
-                            # 如果指定了标记副本目录，也保存一份到该目录
+                            # 只保存原图（如果指定了标记副本目录，也保存一份到该目录）
+                            jpeg_paths = [os.path.join(output_folder, f"item_{row}_{col}.jpg")]
                             if marker_output_folder:
-                                marker_path = os.path.join(marker_output_folder, f"item_{row}_{col}.jpg")
-                                # 确保图像是RGB模式，不是RGBA
-                                if crop_img.mode == 'RGBA':
-                                    rgb_img = Image.new('RGB', crop_img.size, (255, 255, 255))
-                                    rgb_img.paste(crop_img, mask=crop_img.split()[-1])
-                                    rgb_img.save(marker_path, format='JPEG', quality=95)
-                                else:
-                                    crop_img.save(marker_path, format='JPEG', quality=95)
+                                jpeg_paths.append(os.path.join(marker_output_folder, f"item_{row}_{col}.jpg"))
+                            ScreenshotCutter._save_jpeg(crop_img, jpeg_paths)
                         
                         count += 1
                 
@@ -118,24 +118,11 @@ class CSVRecordManager:
             csv_config = self.config_manager.get_csv_output_config()
             encoding = csv_config.get("encoding", "utf-8-sig")  # 使用utf-8-sig以支持Excel
             
-            # 获取表头
-            headers = self._get_csv_headers()
-            
-            # 准备记录数据 - 包含五个字段：original_filename、new_filename、equipment_name、amount和confidence
-            record_data = {
-                'original_filename': record.original_filename,
-                'new_filename': record.new_filename,
-                'equipment_name': record.equipment_name,  # 新增
-                'amount': record.amount,  # 新增
-                'confidence': record.confidence or ""
-            }
-            
             # 写入记录
             with open(csv_path, 'a', newline='', encoding=encoding) as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=headers)
-                writer.writerow(record_data)
+                csv.writer(csvfile).writerow(self._record_to_row(record))
             
-            self.logger.debug(f"记录已添加到CSV: {record.original_filename} -> {record.new_filename}")
+            self.logger.debug("记录已添加到CSV: %s -> %s", record.original_filename, record.new_filename)
             return True
             
         except Exception as e:
@@ -162,10 +149,19 @@ class CSVRecordManager:
         if not self._ensure_csv_exists(csv_path):
             return 0
         
+        # 文件只打开一次，全部记录写入同一个writer（不再逐条打开/关闭文件）
         success_count = 0
-        for record in records:
-            if self.add_record(csv_path, record):
-                success_count += 1
+        try:
+            csv_config = self.config_manager.get_csv_output_config()
+            encoding = csv_config.get("encoding", "utf-8-sig")  # 使用utf-8-sig以支持Excel
+            
+            with open(csv_path, 'a', newline='', encoding=encoding) as csvfile:
+                writer = csv.writer(csvfile)
+                for record in records:
+                    writer.writerow(self._record_to_row(record))
+                    success_count += 1
+        except Exception as e:
+            self.logger.error(f"批量添加记录到CSV失败: {csv_path}, 错误: {e}")
         
         self.logger.info(f"批量添加记录完成，成功: {success_count}/{len(records)}")
         return success_count
@@ -177,7 +173,7 @@ class CSVRecordManager:
             record: 记录数据
         """
         self._records_cache.append(record)
-        self.logger.debug(f"记录已添加到缓存: {record.original_filename}")
+        self.logger.debug("记录已添加到缓存: %s", record.original_filename)
     
     def batch_add_records_to_cache(self, records: List[CSVRecord]) -> None:
         """批量添加记录到内存缓存
@@ -310,6 +306,23 @@ class CSVRecordManager:
         
         return self.create_csv_file(csv_path)
     
+    def _record_to_row(self, record: CSVRecord) -> tuple:
+        """将记录转换为CSV行数据（按表头顺序的元组，直接交给csv.writer，不再逐行构造并校验字典）
+        
+        Args:
+            record: 记录数据
+            
+        Returns:
+            五个字段的元组：original_filename、new_filename、equipment_name、amount和confidence
+        """
+        return (
+            record.original_filename,
+            record.new_filename,
+            record.equipment_name,  # 新增
+            record.amount,  # 新增
+            record.confidence or ""
+        )
+    
     def _get_csv_headers(self) -> List[str]:
         """获取CSV表头
         
@@ -304,7 +304,10 @@ class EnhancedOCRRecognizer:
                 else:
                     enhanced_image = adjusted_gray
             
-            self.logger.debug(f"应用亮度调整: {current_brightness:.2f} -> {np.mean(gray_image if not is_color else cv2.cvtColor(enhanced_image, cv2.COLOR_BGR2GRAY)):.2f}")
+            # 调整后亮度需要额外计算整图均值，只在DEBUG日志开启时计算
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("应用亮度调整: %.2f -> %.2f", current_brightness,
+                                  np.mean(gray_image if not is_color else cv2.cvtColor(enhanced_image, cv2.COLOR_BGR2GRAY)))
         
         # 对比度增强
         contrast_config = ocr_config.get("contrast_enhancement", {})
@@ -368,23 +371,23 @@ class EnhancedOCRRecognizer:
             
             # 应用缩放
             enhanced_image = cv2.resize(enhanced_image, (new_width, new_height), interpolation=cv2.INTER_CUBIC)
-            self.logger.debug(f"应用图像缩放: {scale_factor}x")
+            self.logger.debug("应用图像缩放: %sx", scale_factor)
         
         return enhanced_image
     
-    def _apply_preprocessing_config(self, image_path: str, config: Dict[str, Any]) -> np.ndarray:
-        """应用指定的预处理配置
+    def read_image(self, image_path: str) -> np.ndarray:
+        """读取识别用的BGR图像（支持中文路径）
         
         Args:
             image_path: 图像文件路径
-            config: 预处理配置
             
         Returns:
-            预处理后的图像
+            BGR图像
         """
         # 读取图像 - 使用支持中文路径的方法
-        self.logger.debug(f"尝试读取图像: {image_path}")
-        self.logger.debug(f"路径编码: {image_path.encode('utf-8')}")
+        self.logger.debug("尝试读取图像: %s", image_path)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("路径编码: %s", image_path.encode('utf-8'))
         
         try:
             # 方法1: 使用numpy.fromfile + cv2.imdecode (支持中文路径)
@@ -398,16 +401,33 @@ class EnhancedOCRRecognizer:
                 pil_img = PILImage.open(image_path)
                 if pil_img.mode == 'RGBA':
                     background = PILImage.new('RGB', pil_img.size, (255, 255, 255))
-                    background.paste(pil_img, mask=pil_img.split()[-1])
+                    background.paste(pil_img, mask=pil_img.getchannel('A'))
                     pil_img = background
                 image = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
             
-            self.logger.debug(f"成功读取图像: shape={image.shape}")
+            self.logger.debug("成功读取图像: shape=%s", image.shape)
             
         except Exception as e:
             self.logger.error(f"读取图像失败: {image_path}, 错误: {e}")
             raise FileNotFoundError(f"无法读取图像: {image_path}")
         
+        return image
+    
+    def _apply_preprocessing_config(self, image_path: str, config: Dict[str, Any],
+                                    image: Optional[np.ndarray] = None) -> np.ndarray:
+        """应用指定的预处理配置
+        
+        Args:
+            image_path: 图像文件路径
+            config: 预处理配置
+            image: 已读取的BGR图像（不会被修改），为None时从image_path读取
+            
+        Returns:
+            预处理后的图像
+        """
+        if image is None:
+            image = self.read_image(image_path)
+        
         # 获取OCR配置中的区域设置
         ocr_config = self.config_manager.get_ocr_config()
         region_config = ocr_config.get("recognition_region", {})
@@ -427,14 +447,14 @@ class EnhancedOCRRecognizer:
             
             # 裁剪图像
             image = image[top:bottom, left:right]
-            self.logger.debug(f"应用识别区域裁剪: 左={left}, 右={right}, 上={top}, 下={bottom}")
+            self.logger.debug("应用识别区域裁剪: 左=%s, 右=%s, 上=%s, 下=%s", left, right, top, bottom)
         
         # 应用预处理
         processed_image = image.copy()
         
         # 调试日志：显示配置中的灰度化设置
         grayscale_enabled = config.get("grayscale", False)
-        self.logger.debug(f"配置中的灰度化设置: {grayscale_enabled}")
+        self.logger.debug("配置中的灰度化设置: %s", grayscale_enabled)
         
         # 灰度化处理已禁用，直接使用原始图像
         # 二值化处理已禁用，直接使用原始图像
@@ -444,16 +464,101 @@ class EnhancedOCRRecognizer:
         
         return processed_image
     
-    def recognize_with_fallback(self, image_path: str) -> EnhancedOCRResult:
+    @staticmethod
+    def _get_fallback_configs(ocr_config: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """获取回退预处理配置列表（未配置时使用默认配置）"""
+        fallback_configs = ocr_config.get("fallback_preprocessing", [])
+        
+        # 如果没有回退配置，使用默认配置
+        if not fallback_configs:
+            fallback_configs = [
+                {"name": "默认配置", "grayscale": True, "threshold": True, "denoise": False},
+                {"name": "自适应二值化配置", "grayscale": True, "threshold": True, "denoise": False}
+            ]
+        return fallback_configs
+    
+    def _prepare_for_ocr(self, image_path: str, config: Dict[str, Any],
+                         image: Optional[np.ndarray], ocr_config: Dict[str, Any]) -> np.ndarray:
+        """按配置预处理并（按需）增强图像，得到送入OCR引擎的图像"""
+        # 应用预处理
+        processed_image = self._apply_preprocessing_config(image_path, config, image)
+        
+        # 图像增强
+        if ocr_config.get("brightness_adjustment", {}).get("enabled", False) or \
+           ocr_config.get("contrast_enhancement", {}).get("enabled", False):
+            processed_image = self._enhance_image(processed_image)
+        return processed_image
+    
+    def recognize_batch(self, image_paths: List[str],
+                        images: Optional[List[Optional[np.ndarray]]] = None) -> List[EnhancedOCRResult]:
+        """批量识别：第一个预处理配置对同尺寸图像一次调用 readtext_batched，
+        其余回退流程仍逐张进行
+        
+        只有在 easyocr 的批量输出与逐张 readtext 相同时，结果才与逐张调用
+        recognize_with_fallback 一致；每批的识别耗时按图像数均摊计入 processing_time
+        
+        Args:
+            image_paths: 图像文件路径列表
+            images: 与路径一一对应的已读取BGR图像（元素可为None），为None时全部从路径读取
+            
+        Returns:
+            增强版OCR识别结果列表（顺序与输入一致）
+        """
+        images = list(images) if images is not None else [None] * len(image_paths)
+        first_results: List[Optional[list]] = [None] * len(image_paths)
+        batch_times: List[float] = [0.0] * len(image_paths)
+        
+        batched = getattr(self.ocr_reader, "readtext_batched", None)
+        if batched is not None and len(image_paths) > 1 and self.config_manager.is_ocr_enabled():
+            ocr_config = self.config_manager.get_ocr_config()
+            first_config = self._get_fallback_configs(ocr_config)[0]
+            
+            # 按预处理后的尺寸分组（readtext_batched 要求同一批图像尺寸一致）
+            groups: Dict[Tuple[int, ...], List[Tuple[int, np.ndarray]]] = {}
+            for idx, image_path in enumerate(image_paths):
+                try:
+                    if images[idx] is None:
+                        images[idx] = self.read_image(image_path)
+                    processed_image = self._prepare_for_ocr(image_path, first_config, images[idx], ocr_config)
+                except Exception:
+                    continue  # 交给逐张流程按原逻辑报告
+                groups.setdefault(processed_image.shape, []).append((idx, processed_image))
+            
+            for members in groups.values():
+                if len(members) < 2:
+                    continue
+                batch_start = time.perf_counter()
+                try:
+                    group_results = batched([processed for _, processed in members])
+                except Exception as e:
+                    self.logger.debug(f"批量识别失败，回退逐张识别: {e}")
+                    continue
+                share = (time.perf_counter() - batch_start) / len(members)
+                for (idx, _), results in zip(members, group_results):
+                    first_results[idx] = results
+                    batch_times[idx] = share
+        
+        return [
+            self.recognize_with_fallback(image_path, image, first_results=results, batch_time=batch_time)
+            for image_path, image, results, batch_time in zip(image_paths, images, first_results, batch_times)
+        ]
+    
+    def recognize_with_fallback(self, image_path: str, image: Optional[np.ndarray] = None,
+                                first_results: Optional[list] = None,
+                                batch_time: float = 0.0) -> EnhancedOCRResult:
         """使用回退机制进行OCR识别
         
         Args:
             image_path: 图像文件路径
+            image: 已读取的BGR图像（如由调用方预取），为None时从image_path读取
+            first_results: 第一个预处理配置已得到的OCR结果（由 recognize_batch 批量计算），
+                为None时正常识别
+            batch_time: 批量识别中分摊到该图像的耗时（秒），计入 processing_time
             
         Returns:
             增强版OCR识别结果
         """
-        start_time = time.time()
+        start_time = time.perf_counter() - batch_time
         original_filename = os.path.basename(image_path)
         
         try:
@@ -465,7 +570,7 @@ class EnhancedOCRRecognizer:
                     recognized_text="",
                     extracted_amount=None,
                     confidence=0.0,
-                    processing_time=time.time() - start_time,
+                    processing_time=time.perf_counter() - start_time,
                     success=False,
                     error_message="OCR功能已禁用"
                 )
@@ -475,14 +580,14 @@ class EnhancedOCRRecognizer:
             confidence_threshold = ocr_config.get("confidence_threshold", 0.7)
             
             # 获取回退预处理配置列表
-            fallback_configs = ocr_config.get("fallback_preprocessing", [])
+            fallback_configs = self._get_fallback_configs(ocr_config)
             
-            # 如果没有回退配置，使用默认配置
-            if not fallback_configs:
-                fallback_configs = [
-                    {"name": "默认配置", "grayscale": True, "threshold": True, "denoise": False},
-                    {"name": "自适应二值化配置", "grayscale": True, "threshold": True, "denoise": False}
-                ]
+            # 图像只读取一次，各预处理配置共用（读取失败时保持原行为：每个配置各自报错）
+            if image is None:
+                try:
+                    image = self.read_image(image_path)
+                except FileNotFoundError:
+                    image = None
             
             # 尝试每种预处理配置
             best_result = None
@@ -490,19 +595,16 @@ class EnhancedOCRRecognizer:
             
             for i, config in enumerate(fallback_configs):
                 config_name = config.get("name", f"配置{i+1}")
-                self.logger.debug(f"尝试预处理配置: {config_name}")
+                self.logger.debug("尝试预处理配置: %s", config_name)
                 
                 try:
-                    # 应用预处理
-                    processed_image = self._apply_preprocessing_config(image_path, config)
-                    
-                    # 图像增强
-                    if ocr_config.get("brightness_adjustment", {}).get("enabled", False) or \
-                       ocr_config.get("contrast_enhancement", {}).get("enabled", False):
-                        processed_image = self._enhance_image(processed_image)
-                    
-                    # OCR识别
-                    results = self.ocr_reader.readtext(processed_image)
+                    if i == 0 and first_results is not None:
+                        # 已由批量识别得到
+                        results = first_results
+                    else:
+                        # 预处理、增强后进行OCR识别
+                        processed_image = self._prepare_for_ocr(image_path, config, image, ocr_config)
+                        results = self.ocr_reader.readtext(processed_image)
                     
                     if results:
                         # 提取文本和置信度
@@ -531,7 +633,7 @@ class EnhancedOCRRecognizer:
                         
                         # 如果已经成功，可以提前结束
                         if success:
-                            self.logger.debug(f"使用配置 '{config_name}' 成功识别")
+                            self.logger.debug("使用配置 '%s' 成功识别", config_name)
                             break
                     
                 except Exception as e:
@@ -558,13 +660,13 @@ class EnhancedOCRRecognizer:
                     recognized_text="",
                     extracted_amount=None,
                     confidence=0.0,
-                    processing_time=time.time() - start_time,
+                    processing_time=time.perf_counter() - start_time,
                     success=False,
                     error_message="所有预处理配置都无法识别文本",
                     fallback_attempts=len(fallback_configs)
                 )
             
-            processing_time = time.time() - start_time
+            processing_time = time.perf_counter() - start_time
             # 简化输出格式：只显示文本、置信度（删除金额列）
             if NODE_LOGGER_AVAILABLE:
                 logger = get_logger()
@@ -589,7 +691,7 @@ class EnhancedOCRRecognizer:
             )
             
         except Exception as e:
-            processing_time = time.time() - start_time
+            processing_time = time.perf_counter() - start_time
             error_message = f"识别过程中发生错误: {str(e)}"
             self.logger.error(f"识别失败: {image_path}, 错误: {error_message}")
             
@@ -643,10 +745,10 @@ class EnhancedOCRRecognizer:
             self.logger.error(f"文件夹不存在: {image_folder}")
             return []
         
-        # 获取支持的文件格式
+        # 获取支持的文件格式（转为集合，逐文件判断时为哈希查找）
         file_naming_config = self.config_manager.get_file_naming_config()
-        supported_formats = file_naming_config.get("supported_formats",
-                                                 [".png", ".jpg", ".jpeg", ".bmp", ".tiff"])
+        supported_formats = set(file_naming_config.get("supported_formats",
+                                                     [".png", ".jpg", ".jpeg", ".bmp", ".tiff"]))
         
         # 收集所有要处理的文件夹
         folders_to_process = [image_folder]
@@ -662,12 +764,12 @@ class EnhancedOCRRecognizer:
         all_image_files = []
         for folder in folders_to_process:
             try:
-                for filename in os.listdir(folder):
-                    file_path = os.path.join(folder, filename)
-                    if os.path.isfile(file_path):
-                        _, ext = os.path.splitext(filename.lower())
-                        if ext in supported_formats:
-                            all_image_files.append(file_path)
+                # 单次scandir：先按扩展名过滤，只有匹配的文件才判断类型和取路径（目录项类型通常无需额外stat）
+                with os.scandir(folder) as it:
+                    for entry in it:
+                        _, ext = os.path.splitext(entry.name.lower())
+                        if ext in supported_formats and entry.is_file():
+                            all_image_files.append(entry.path)
             except Exception as e:
                 self.logger.error(f"读取文件夹失败 {folder}: {e}")
         
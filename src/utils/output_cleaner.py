@@ -8,6 +8,7 @@
 
 import os
 import shutil
+import sys
 from pathlib import Path
 from typing import List, Optional, Union
 import logging
@@ -15,6 +16,20 @@ import logging
 # 设置日志
 logger = logging.getLogger(__name__)
 
+
+def _rmtree_error_kwargs(failed: List[str]) -> dict:
+    """生成 shutil.rmtree 的错误回调参数：记录警告并收集删除失败的路径
+
+    Python 3.12 起 onerror 已弃用，改用 onexc（回调直接收到异常对象）。
+    """
+    def record(path, exc) -> None:
+        failed.append(path)
+        logger.warning(f"删除项目失败 {path}: {exc}")
+
+    if sys.version_info >= (3, 12):
+        return {'onexc': lambda func, path, exc: record(path, exc)}
+    return {'onerror': lambda func, path, exc_info: record(path, exc_info[1])}
+
 class OutputCleaner:
     """输出目录清理��"""
 
@@ -54,24 +69,31 @@ class OutputCleaner:
         dir_path = Path(directory)
 
         try:
-            if dir_path.exists():
-                # 删除目录中的所有内容
-                for item in dir_path.iterdir():
-                    try:
-                        if item.is_file() or item.is_symlink():
-                            item.unlink()
-                        elif item.is_dir():
-                            shutil.rmtree(item)
-                    except Exception as e:
-                        logger.warning(f"删除项目失败 {item}: {e}")
-
-                logger.info(f"已清理目录: {dir_path}")
-
-            # 重新创建空目录
-            if recreate:
+            failed: List[str] = []
+            existed = dir_path.exists()
+            if existed:
+                # 只清空目录内容、保留目录本身（保留其权限/属主，目录被其他程序打开时也不会失败）；
+                # 符号链接指向的目录同样只清空其中的内容
+                error_kwargs = _rmtree_error_kwargs(failed)
+                with os.scandir(dir_path) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            shutil.rmtree(entry.path, **error_kwargs)
+                        else:
+                            try:
+                                os.unlink(entry.path)
+                            except OSError as e:
+                                failed.append(entry.path)
+                                logger.warning(f"删除项目失败 {entry.path}: {e}")
+            elif recreate:
                 dir_path.mkdir(parents=True, exist_ok=True)
                 logger.debug(f"已重新创建目录: {dir_path}")
 
+            if failed:
+                logger.error(f"清理目录不完整 {dir_path}: {len(failed)} 个项目删除失败")
+                return False
+            if existed:
+                logger.info(f"已清理目录: {dir_path}")
             return True
 
         except Exception as e:
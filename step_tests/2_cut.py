@@ -21,7 +21,6 @@ import sys
 import tempfile
 from pathlib import Path
 from datetime import datetime
-from PIL import Image, ImageDraw
 
 # Project root
 project_root = Path(__file__).resolve().parents[1]
@@ -44,21 +43,35 @@ def check_dependencies() -> bool:
 
 
 def clean_dir(path: Path) -> None:
-    if not path.exists(): return
-    for p in path.iterdir():
-        try:
-            if p.is_file() or p.is_symlink(): p.unlink()
-            else: shutil.rmtree(p)
-        except Exception:
-            pass
-
-
-def rename_sequence(folder: Path, exclude_suffix: str = '_circle.png') -> None:
-    if not folder.exists(): return
-
-    files = list(folder.iterdir())
-    circle = sorted([p for p in files if p.name.endswith('_circle.png')])
-    regular = sorted([p for p in files if p.suffix.lower() in ('.png','.jpg','.jpeg','.webp') and not p.name.endswith('_circle.png')])
+    """清空目录内容并保留目录本身（目录不存在时创建；符号链接目录同样只清空其内容）"""
+    if not path.exists():
+        path.mkdir(parents=True, exist_ok=True)
+        return
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                if entry.is_dir(follow_symlinks=False): shutil.rmtree(entry.path)
+                else: os.unlink(entry.path)
+            except Exception:
+                pass
+
+
+def rename_sequence(folder: Path, exclude_suffix: str = '_circle.png') -> int:
+    """按序号重命名输出文件，返回目录中的矩形图数量"""
+    if not folder.exists(): return 0
+
+    # 单次 scandir：DirEntry 自带类型信息，无需逐个 stat
+    circle, regular = [], []
+    with os.scandir(folder) as it:
+        for entry in it:
+            if not entry.is_file(): continue
+            name = entry.name
+            if name.endswith('_circle.png'):
+                circle.append(Path(entry.path))
+            elif os.path.splitext(name)[1].lower() in ('.png','.jpg','.jpeg','.webp'):
+                regular.append(Path(entry.path))
+    circle.sort()
+    regular.sort()
 
     # 圆形文件仍重命名，但留在临时目录，随后会被移到 transparent
     for i,p in enumerate(circle,1):
@@ -73,6 +86,8 @@ def rename_sequence(folder: Path, exclude_suffix: str = '_circle.png') -> None:
             try: p.rename(dst)
             except: pass
 
+    return len(regular)
+
 
 # ============================================================
 # 主流程 - 修改实现你的要求
@@ -99,17 +114,23 @@ def step2_cut_screenshots(auto_mode=True, auto_clear_old=True, save_original=Tru
         print(f"ERROR: 缺少 {game_dir}")
         return False
 
-    screenshots = sorted([p for p in game_dir.iterdir() if p.suffix.lower() in ('.png','.jpg','.jpeg','.webp')])
+    # 单次 scandir 先按扩展名过滤再构造 Path，只对匹配的截图排序（目录项的文件类型无需额外 stat）
+    with os.scandir(game_dir) as it:
+        screenshots = sorted(
+            Path(entry.path) for entry in it
+            if os.path.splitext(entry.name)[1].lower() in ('.png', '.jpg', '.jpeg', '.webp') and entry.is_file()
+        )
     if not screenshots:
         print("ERROR: 未找到截图")
         return False
 
     # 自动清理输出目录（使用统一的清理工具）
+    cleaned = False
     if auto_clear_old:
         try:
             from src.utils.output_cleaner import clean_step_outputs
             print("清理步骤2的输出目录…")
-            clean_step_outputs('cut', project_root)
+            cleaned = clean_step_outputs('cut', project_root)
             print("[OK] 清理完成")
         except ImportError:
             # 回退到原来的清理方法
@@ -127,12 +148,11 @@ def step2_cut_screenshots(auto_mode=True, auto_clear_old=True, save_original=Tru
     transparent_subdir = project_root / 'output_enter_image' / 'equipment_transparent'  # 圆形透明图输出
     transparent_subdir.mkdir(parents=True, exist_ok=True)
 
-    if auto_clear_old and 'clean_step_outputs' not in globals():
+    # 仅在统一清理工具不可用或失败时回退（避免同一目录被清理两遍）
+    if auto_clear_old and not cleaned:
         print("清理输出目录…")
         clean_dir(marker_dir)
         clean_dir(transparent_subdir)
-        marker_dir.mkdir(parents=True, exist_ok=True)
-        transparent_subdir.mkdir(parents=True, exist_ok=True)
         print("清理完成")
 
     try:
@@ -145,6 +165,9 @@ def step2_cut_screenshots(auto_mode=True, auto_clear_old=True, save_original=Tru
 
     processed = 0
     total_cropped = 0
+    # 已统计的矩形图数量（避免每张截图都重新扫描输出目录）；未清理旧输出时，
+    # 目录中已有的矩形图先计入，不算作第一张截图的切割结果
+    regular_seen = rename_sequence(marker_dir)
 
     for shot in screenshots:
         print(f"处理截图: {shot.name}")
@@ -163,7 +186,8 @@ def step2_cut_screenshots(auto_mode=True, auto_clear_old=True, save_original=Tru
             'v_spacing': 20,  # 纵向间隔：20像素
             'draw_circle': True,
             'save_original': save_original,
-            'marker_output_folder': str(output_folder)
+            'marker_output_folder': str(output_folder),
+            'create_dirs': False  # 输出目录已在循环前创建
         }
 
         ok = cutter.cut_fixed(
@@ -178,7 +202,7 @@ def step2_cut_screenshots(auto_mode=True, auto_clear_old=True, save_original=Tru
         processed += 1
 
         # 重命名输出（按原逻辑）
-        rename_sequence(output_folder)
+        regular_total = rename_sequence(output_folder)
 
         # 移动所有 *_circle.png 到 transparent 子目录
         circle_files = list(output_folder.glob('*_circle.png'))
@@ -189,9 +213,8 @@ def step2_cut_screenshots(auto_mode=True, auto_clear_old=True, save_original=Tru
             except Exception as e:
                 print(f"[WARNING] 移动圆形文件失败 {f} -> {dst}: {e}")
 
-        cropped_items = sum(1 for p in output_folder.iterdir()
-                             if p.is_file() and p.suffix.lower() in ('.png','.jpg','.jpeg','.webp')
-                             and '_circle' not in p.name)
+        cropped_items = regular_total - regular_seen
+        regular_seen = regular_total
         total_cropped += cropped_items
         print(f"截图 {shot.name} 已完成：{cropped_items} 个矩形装备图 + {len(circle_files)} 个圆形透明图")
     return True
@@ -205,12 +228,15 @@ def test_step2_cutting():
     tmp = Path(tempfile.mkdtemp())
     try:
         test_img = tmp / "test.png"
-        img = Image.new('RGB',(600,400),'gray')
-        draw = ImageDraw.Draw(img)
+        import cv2
+        import numpy as np
+        # 直接用NumPy/OpenCV合成测试截图（BGR），无需PIL绘制和格式往返
+        img = np.full((400,600,3), 128, dtype=np.uint8)
         for i in range(4):
             x=30+i*120; y=200
-            draw.rectangle([x,y,x+100,y+120], fill='red', outline='black')
-        img.save(test_img)
+            cv2.rectangle(img, (x,y), (x+100,y+120), (0,0,255), -1)
+            cv2.rectangle(img, (x,y), (x+100,y+120), (0,0,0), 1)
+        cv2.imwrite(str(test_img), img)
 
         game_dir = project_root / 'output_enter_image' / 'game_screenshots'
         game_dir.mkdir(parents=True, exist_ok=True)
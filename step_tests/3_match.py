@@ -19,8 +19,10 @@ import sys
 import json
 import csv
 import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, List, Dict, Tuple, Generator
+from typing import Optional, List, Dict, Tuple, Generator, Iterator
 from dataclasses import dataclass, asdict
 from datetime import datetime
 
@@ -28,6 +30,13 @@ import cv2
 import numpy as np
 from PIL import Image
 
+# 可选：Numba加速LAB像素距离计算
+try:
+    from numba import njit, prange, set_num_threads
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 # 添加项目根目录到Python路径
 sys.path.append(str(Path(__file__).parent.parent))
 
@@ -57,6 +66,11 @@ class MatchResult:
         return asdict(self)
 
 
+def _result_stems(results: List[MatchResult]) -> List[Tuple[MatchResult, str, str]]:
+    """一次性计算每个结果的 (结果, 对比图像名去扩展名, 基准图像名去扩展名)，后续循环直接解包"""
+    return [(r, r.compare_image.rsplit('.', 1)[0], r.base_image.rsplit('.', 1)[0]) for r in results]
+
+
 @dataclass
 class MatchConfig:
     """匹配配置数据类"""
@@ -64,8 +78,73 @@ class MatchConfig:
     max_color_distance: float = 300.0
     circle_radius: int = 55
     equipment_ratio_threshold: float = 0.02  # 降低阈值
-    save_comparison_images: bool = True
+    save_comparison_images: bool = True  # 调试模式下是否保存对比图像（对比图像只在 debug_artifacts 开启时生成）
     use_circle_mask: bool = True  # 是否使用圆形掩码
+    debug_artifacts: bool = False  # 是否生成调试产物（对比图像、逐像素距离统计）
+    color_skip_score: float = 90.0  # 最高模板分数超过该值且明显领先时跳过其余候选的颜色匹配，<=0 关闭
+    color_skip_margin: float = 5.0  # 判定“明显领先”所需的与次高分的差距
+    use_opencl: bool = False  # 是否通过cv2.UMat（OpenCL）计算批量NCC，不可用时自动回退
+    max_workers: int = 0  # 匹配进程数，0表示使用CPU核心数，1表示不使用进程池
+    parallel_min_images: int = 32  # 对比图像少于该数量时不启动进程池（进程启动开销大于收益）
+
+
+# ==================== 掩码常量与缓存 ====================
+# 匹配统一使用的图像尺寸（与步骤2输出的116像素圆形图标一致）。
+# 实测缩小到112仅按像素数比例变快（约7%~13%），并无步长对齐收益，
+# 且需同步缩放圆形半径并使模板缓存失效，因此保持116。
+MATCH_SIZE = 116
+# 圆形掩码只取决于半径，按半径缓存复用（只读）
+_CIRCLE_MASK_CACHE: Dict[int, np.ndarray] = {}
+# 已解码图像的进程内缓存：路径 -> ((修改时间ns, 大小), 只读图像)
+_IMAGE_CACHE: Dict[str, Tuple[Tuple[int, int], np.ndarray]] = {}
+_ERODE_KERNEL = cv2.getStructuringElement(cv2.MORPH_CROSS, (3, 3))
+_CLOSE_KERNEL = np.ones((5, 8), np.uint8)
+# 紫色背景检测范围 (BGR)，inRange 单次SIMD遍历完成三通道区间判定
+_PURPLE_LOWER = np.array([25, 15, 25], dtype=np.uint8)
+_PURPLE_UPPER = np.array([70, 55, 70], dtype=np.uint8)
+
+
+def _get_circle_mask_116(radius: int) -> np.ndarray:
+    """获取116x116、圆心(58,58)的实心圆形掩码（按半径缓存）"""
+    mask = _CIRCLE_MASK_CACHE.get(radius)
+    if mask is None:
+        mask = np.zeros((MATCH_SIZE, MATCH_SIZE), dtype=np.uint8)
+        cv2.circle(mask, (MATCH_SIZE // 2, MATCH_SIZE // 2), radius, 255, -1)
+        mask.flags.writeable = False
+        _CIRCLE_MASK_CACHE[radius] = mask
+    return mask
+
+
+# ==================== LAB像素距离 ====================
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _lab_mean_distance_numba(lab1, lab2, mask):
+        """掩码区域内LAB欧氏距离均值（单次遍历，无中间数组）"""
+        total = 0.0
+        count = 0
+        for y in prange(lab1.shape[0]):
+            for x in range(lab1.shape[1]):
+                if mask[y, x]:
+                    d0 = float(lab1[y, x, 0]) - float(lab2[y, x, 0])
+                    d1 = float(lab1[y, x, 1]) - float(lab2[y, x, 1])
+                    d2 = float(lab1[y, x, 2]) - float(lab2[y, x, 2])
+                    total += np.sqrt(d0 * d0 + d1 * d1 + d2 * d2)
+                    count += 1
+        return total / max(count, 1)
+
+
+def lab_pixel_distances(lab1: np.ndarray, lab2: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """掩码区域内逐像素LAB欧氏距离（uint8绝对差 + int32平方和，无回绕且无浮点中间数组）"""
+    diff = cv2.absdiff(lab1, lab2)
+    squared = np.einsum('ijk,ijk->ij', diff, diff, dtype=np.int32)
+    return np.sqrt(squared[mask > 0], dtype=np.float32)
+
+
+def lab_mean_distance(lab1: np.ndarray, lab2: np.ndarray, mask: np.ndarray) -> float:
+    """掩码区域内LAB欧氏距离均值（Numba可用时使用JIT内核）"""
+    if NUMBA_AVAILABLE:
+        return float(_lab_mean_distance_numba(lab1, lab2, mask))
+    return float(np.mean(lab_pixel_distances(lab1, lab2, mask), dtype=np.float64))
 
 
 # ==================== 图像处理工具类 ====================
@@ -74,14 +153,29 @@ class ImageProcessor:
     
     @staticmethod
     def load_image(image_path: Path) -> Optional[np.ndarray]:
-        """加载图像并处理透明通道"""
+        """加载图像并处理透明通道（透明部分按白色背景合成）"""
         try:
+            # 8位BGR/BGRA直接由OpenCV解码（np.fromfile支持中文路径），省去PIL合成和RGB→BGR转换
+            img = cv2.imdecode(np.fromfile(str(image_path), dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+            if img is not None and img.dtype == np.uint8 and img.ndim == 3:
+                if img.shape[2] == 3:
+                    return img
+                if img.shape[2] == 4:
+                    # 与PIL按透明度粘贴到白底逐像素一致：255 - round((255 - c) * a / 255)
+                    alpha = cv2.cvtColor(img[:, :, 3], cv2.COLOR_GRAY2BGR)
+                    return cv2.bitwise_not(cv2.multiply(cv2.bitwise_not(img[:, :, :3]), alpha, scale=1 / 255))
+            
+            # 其他格式（灰度、16位等）仍按PIL流程处理
             img = Image.open(image_path)
             if img.mode == 'RGBA':
                 background = Image.new('RGB', img.size, (255, 255, 255))
-                background.paste(img, mask=img.split()[-1])
+                background.paste(img, mask=img.getchannel('A'))
                 img = background
             
+            # RGB图像由cvtColor直接生成新的BGR数组，np.asarray只读视图即可，省去一次整图拷贝
+            if img.mode == 'RGB':
+                return cv2.cvtColor(np.asarray(img), cv2.COLOR_RGB2BGR)
+            
             img_array = np.array(img)
             if len(img_array.shape) == 3 and img_array.shape[2] == 3:
                 img_array = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
@@ -91,49 +185,46 @@ class ImageProcessor:
             logger.error(f"加载图像失败 {image_path}: {e}")
             return None
     
+    @staticmethod
+    def resize_into(src: np.ndarray, dst_view: np.ndarray, interpolation: int = cv2.INTER_LINEAR) -> None:
+        """将图像缩放写入目标区域（OpenCV另行分配结果时再赋值回去）"""
+        resized = cv2.resize(src, (dst_view.shape[1], dst_view.shape[0]), dst=dst_view, interpolation=interpolation)
+        if resized is not dst_view:
+            dst_view[...] = resized
+    
     @staticmethod
     def create_equipment_mask(image: np.ndarray, radius: int = 55, tolerance: int = 23, erode_iterations: int = 2) -> np.ndarray:
         """创建装备本体掩码（精确版：只去除紫色背景，保留装备细节）"""
         try:
             height, width = image.shape[:2]
-            if height != 116 or width != 116:
-                image = cv2.resize(image, (116, 116))
-                height, width = 116, 116
+            if height != MATCH_SIZE or width != MATCH_SIZE:
+                image = cv2.resize(image, (MATCH_SIZE, MATCH_SIZE))
+                height, width = MATCH_SIZE, MATCH_SIZE
             
             center_x, center_y = width // 2, height // 2
             max_radius = min(center_x, center_y)
             radius = min(radius, max_radius)
             
-            circle_mask = np.zeros((height, width), dtype=np.uint8)
-            cv2.circle(circle_mask, (center_x, center_y), radius, 255, -1)
+            circle_mask = _get_circle_mask_116(radius)
             
             # 检测紫色区域 (BGR: 46, 33, 46) - 扩大范围以覆盖所有紫色变体
-            purple_mask = cv2.inRange(image, np.array([25, 15, 25]), np.array([70, 55, 70]))
-            
-            # 关键：只在圆形边缘区域去除紫色，保留中心装备的所有颜色
-            # 创建边缘环形区域（外圈35像素，大幅扩大边缘区域）
-            inner_circle = np.zeros((height, width), dtype=np.uint8)
-            # 内圈半径缩小到20，这样边缘区域从半径20到55，宽度35像素
-            cv2.circle(inner_circle, (center_x, center_y), 0, 255, -1)
-            
-            # 边缘区域 = 圆形掩码 - 内圈
-            edge_region = cv2.subtract(circle_mask, inner_circle)
+            purple_mask = cv2.inRange(image, _PURPLE_LOWER, _PURPLE_UPPER)
             
-            # 只在边缘区域去除紫色
-            purple_in_edge = cv2.bitwise_and(purple_mask, edge_region)
-            
-            # 最终掩码 = 圆形区域 - 边缘紫色
-            equipment_mask = cv2.bitwise_and(circle_mask, cv2.bitwise_not(purple_in_edge))
+            # 关键：只在圆形边缘区域去除紫色（内圈半径为0，即仅保留圆心像素）
+            # 最终掩码 = 圆形区域 - 边缘紫色 = 圆形区域 & (非紫色 | 圆心)，一次按位运算完成
+            keep_mask = cv2.bitwise_not(purple_mask)
+            keep_mask[center_y, center_x] = 255
+            equipment_mask = cv2.bitwise_and(circle_mask, keep_mask)
             
             # 轻微形态学处理
-            kernel = np.ones((5, 8), np.uint8)
-            equipment_mask = cv2.morphologyEx(equipment_mask, cv2.MORPH_CLOSE, kernel, iterations=1)
+            equipment_mask = cv2.morphologyEx(equipment_mask, cv2.MORPH_CLOSE, _CLOSE_KERNEL, iterations=1)
             
-            # 轻微羽化
-            equipment_mask = cv2.GaussianBlur(equipment_mask.astype(np.float32), (7, 7), 4)
-            _, equipment_mask = cv2.threshold(equipment_mask, 200, 255, cv2.THRESH_BINARY)
+            # 边缘收缩：十字核腐蚀，近似原先的高斯羽化(7x7, sigma=4)+阈值200，无需float32往返。
+            # 两者都把边缘向内收缩约2像素，但并不等价：凹角、细小突起处结果不同
+            # （约0.6%的前景像素），掩码变化会使颜色得分有小幅差异
+            equipment_mask = cv2.erode(equipment_mask, _ERODE_KERNEL, iterations=erode_iterations)
             
-            return equipment_mask.astype(np.uint8)
+            return equipment_mask
         except Exception as e:
             logger.error(f"装备掩码创建失败: {e}")
             return np.zeros((image.shape[0], image.shape[1]), dtype=np.uint8)
@@ -143,6 +234,10 @@ class ImageProcessor:
 class TemplateCache:
     """模板特征缓存管理器"""
 
+    # 缓存文件格式版本：v2 全部为普通数值数组（无需pickle即可加载），旧格式文件视为过期并重建
+    CACHE_VERSION = 2
+    CHANNELS = ('L', 'A', 'B')
+
     def __init__(self, cache_dir: Path = None):
         self.cache_dir = cache_dir or Path("output_enter_image/template_cache")
         self.cache_dir.mkdir(parents=True, exist_ok=True)
@@ -159,32 +254,43 @@ class TemplateCache:
         # 检查缓存是否存在且有效
         if cache_path.exists():
             try:
-                cached_data = np.load(cache_path)
-                # 检查模板文件是否修改
-                template_mtime = template_path.stat().st_mtime
-                cache_mtime = cached_data['cache_timestamp']
-                if template_mtime <= cache_mtime:
-                    return {
-                        'lab_vectors': cached_data['lab_vectors'],
-                        'lab_stats': cached_data['lab_stats'],
-                        'mask_coords': cached_data['mask_coords'],
-                        'mask_count': int(cached_data['mask_count'])
-                    }
+                with np.load(cache_path) as cached_data:
+                    if 'cache_version' not in cached_data.files or \
+                            int(cached_data['cache_version']) != self.CACHE_VERSION:
+                        return None
+                    # 检查模板文件是否修改
+                    template_mtime = template_path.stat().st_mtime
+                    cache_mtime = cached_data['cache_timestamp']
+                    if template_mtime <= cache_mtime:
+                        # 打包的 (3,K) / (3,2) / (2,K) 数组还原为特征字典结构
+                        lab_vectors = cached_data['lab_vectors']
+                        lab_stats = cached_data['lab_stats']
+                        mask_coords = cached_data['mask_coords']
+                        return {
+                            'lab_vectors': dict(zip(self.CHANNELS, lab_vectors)),
+                            'lab_stats': {name: {'mean': float(mean), 'std': float(std)}
+                                          for name, (mean, std) in zip(self.CHANNELS, lab_stats)},
+                            'mask_coords': (mask_coords[0], mask_coords[1]),
+                            'mask_count': int(cached_data['mask_count'])
+                        }
             except Exception as e:
                 logger.warning(f"缓存加载失败 {template_name}: {e}")
 
         return None
 
     def save_template_features(self, template_name: str, features: Dict, template_path: Path):
-        """保存模板特征到缓存"""
+        """保存模板特征到缓存（字典结构打包为连续数值数组）"""
         cache_path = self.get_cache_path(template_name)
         try:
+            lab_stats = features['lab_stats']
             np.savez_compressed(cache_path,
-                              lab_vectors=features['lab_vectors'],
-                              lab_stats=features['lab_stats'],
-                              mask_coords=features['mask_coords'],
+                              lab_vectors=np.stack([features['lab_vectors'][name] for name in self.CHANNELS]),
+                              lab_stats=np.array([[lab_stats[name]['mean'], lab_stats[name]['std']]
+                                                  for name in self.CHANNELS]),
+                              mask_coords=np.stack(features['mask_coords']),
                               mask_count=features['mask_count'],
-                              cache_timestamp=template_path.stat().st_mtime)
+                              cache_timestamp=template_path.stat().st_mtime,
+                              cache_version=self.CACHE_VERSION)
         except Exception as e:
             logger.error(f"缓存保存失败 {template_name}: {e}")
 
@@ -193,21 +299,24 @@ class TemplateCache:
 class VectorizedNCCProcessor:
     """向量化NCC处理器 - 预处理模板并缓存特征"""
 
+    CHANNEL_WEIGHTS = (0.5, 0.25, 0.25)  # L, A, B 通道权重
+
     def __init__(self, cache_manager: TemplateCache):
         self.cache = cache_manager
         self.processor = ImageProcessor()
 
-    def preprocess_template_to_vectors(self, template_path: Path) -> Dict:
-        """预处理模板图像，生成标准化的LAB向量特征"""
+    def preprocess_template_to_vectors(self, template_path: Path, template_img: Optional[np.ndarray] = None) -> Dict:
+        """预处理模板图像，生成标准化的LAB向量特征（已加载的图像直接传入，避免重复读盘解码）"""
         try:
             # 加载模板图像
-            template_img = self.processor.load_image(template_path)
+            if template_img is None:
+                template_img = self.processor.load_image(template_path)
             if template_img is None:
                 return None
 
             # 标准化尺寸
-            if template_img.shape[:2] != (116, 116):
-                template_img = cv2.resize(template_img, (116, 116))
+            if template_img.shape[:2] != (MATCH_SIZE, MATCH_SIZE):
+                template_img = cv2.resize(template_img, (MATCH_SIZE, MATCH_SIZE))
 
             # 转换到LAB色彩空间
             template_lab = cv2.cvtColor(template_img, cv2.COLOR_BGR2LAB)
@@ -225,13 +334,18 @@ class VectorizedNCCProcessor:
             lab_vectors = {}
             lab_stats = {}
 
+            # LAB保持uint8：三通道均值/标准差由cv2.meanStdDev单次遍历得到，
+            # 掩码像素也只做一次 (K,3) 提取，不再逐通道高级索引
+            means, stds = cv2.meanStdDev(template_lab, mask=equipment_mask)
+            masked_pixels = template_lab[mask_coords]
+
             for channel_idx, channel_name in enumerate(['L', 'A', 'B']):
                 # 提取掩码区域的像素值
-                channel_pixels = template_lab[:, :, channel_idx][mask_coords]
+                channel_pixels = masked_pixels[:, channel_idx]
 
                 # 计算统计信息
-                mean_val = np.mean(channel_pixels)
-                std_val = np.std(channel_pixels)
+                mean_val = float(means[channel_idx, 0])
+                std_val = float(stds[channel_idx, 0])
 
                 # 标准化向量 (零均值，单位方差)
                 if std_val > 1e-8:  # 避免除零
@@ -255,51 +369,51 @@ class VectorizedNCCProcessor:
             logger.error(f"模板预处理失败 {template_path}: {e}")
             return None
 
-    def get_or_compute_template_features(self, template_path: Path, template_name: str) -> Optional[Dict]:
-        """获取或计算模板特征（带缓存）"""
+    def get_or_compute_template_features(self, template_path: Path, template_name: str,
+                                         template_img: Optional[np.ndarray] = None) -> Optional[Dict]:
+        """获取或计算模板特征（带缓存，template_img为已加载的模板图像，可选）"""
+        # 优先使用内存缓存，避免每个对比图像都重新计算模板掩码
+        if template_name in self.cache.template_cache:
+            return self.cache.template_cache[template_name]
+
         # 尝试从缓存加载
-        cached_features = self.cache.load_template_features(template_name, template_path)
-        if cached_features is not None:
-            return cached_features
+        features = self.cache.load_template_features(template_name, template_path)
+        if features is None:
+            # 计算新特征
+            features = self.preprocess_template_to_vectors(template_path, template_img)
+            if features is not None:
+                self.cache.save_template_features(template_name, features, template_path)
 
-        # 计算新特征
-        features = self.preprocess_template_to_vectors(template_path)
         if features is not None:
-            self.cache.save_template_features(template_name, features, template_path)
-
+            self.cache.template_cache[template_name] = features
         return features
 
     def compute_vectorized_ncc_score(self, template_features: Dict, scene_img: np.ndarray) -> float:
         """使用向量化NCC计算匹配分数"""
         try:
             # 标准化场景图像
-            if scene_img.shape[:2] != (116, 116):
-                scene_img = cv2.resize(scene_img, (116, 116))
+            if scene_img.shape[:2] != (MATCH_SIZE, MATCH_SIZE):
+                scene_img = cv2.resize(scene_img, (MATCH_SIZE, MATCH_SIZE))
 
             # 转换到LAB色彩空间
             scene_lab = cv2.cvtColor(scene_img, cv2.COLOR_BGR2LAB)
 
-            # 使用模板的掩码坐标
-            mask_coords = template_features['mask_coords']
+            # 使用模板的掩码坐标，三通道像素一次提取为 (K,3)
+            scene_pixels = scene_lab[template_features['mask_coords']].astype(np.float64)
 
             # 计算每个通道的NCC分数
             channel_scores = []
-            weights = [0.5, 0.25, 0.25]  # L, A, B 通道权重
+            weights = self.CHANNEL_WEIGHTS
 
             for channel_idx, (channel_name, weight) in enumerate(zip(['L', 'A', 'B'], weights)):
-                # 提取场景图像对应掩码区域的像素
-                scene_pixels = scene_lab[:, :, channel_idx][mask_coords]
-
-                # 标准化场景向量（使用模板的统计信息保持一致性）
-                template_stats = template_features['lab_stats'][channel_name]
-                if template_stats['std'] > 1e-8:
-                    scene_normalized = (scene_pixels - template_stats['mean']) / template_stats['std']
-                else:
-                    scene_normalized = np.zeros_like(scene_pixels)
-
-                # 计算NCC分数（标准化向量的点积）
+                # 分解为相关项 + 模板统计量：模板向量零均值，场景减均值项为0，
+                # 因此 NCC = dot(v, s) / (std * n)，无需逐像素标准化场景向量（与批量矩阵路径一致）
+                template_std = template_features['lab_stats'][channel_name]['std']
                 template_vector = template_features['lab_vectors'][channel_name]
-                ncc_score = np.dot(template_vector, scene_normalized) / len(template_vector)
+                if template_std > 1e-8:
+                    ncc_score = np.dot(template_vector, scene_pixels[:, channel_idx]) / (template_std * len(template_vector))
+                else:
+                    ncc_score = 0.0
 
                 # 确保分数在合理范围内（数值稳定性）
                 ncc_score = max(-1.0, min(1.0, ncc_score))
@@ -313,6 +427,63 @@ class VectorizedNCCProcessor:
             logger.error(f"向量化NCC计算失败: {e}")
             return 0.0
 
+    @staticmethod
+    def build_template_matrix(features_list: List[Optional[Dict]]) -> Tuple[np.ndarray, np.ndarray]:
+        """将多个模板特征堆叠为权重矩阵 (3, N, P)，返回 (矩阵, 像素索引)
+
+        标准化模板向量零均值，因此 NCC = dot(v, s) / (std * n)，场景均值项可省略，
+        权重中直接并入 1 / (std * n)。特征为None的模板对应全零行（得分0）。
+        只保留至少一个模板掩码覆盖的像素列（P ≤ 116*116），圆形以外的角落不参与计算。
+        """
+        matrix = np.zeros((3, len(features_list), MATCH_SIZE * MATCH_SIZE), dtype=np.float32)
+        for row, features in enumerate(features_list):
+            if features is None:
+                continue
+            flat_idx = np.ravel_multi_index(tuple(features['mask_coords']), (MATCH_SIZE, MATCH_SIZE))
+            count = len(flat_idx)
+            for channel_idx, channel_name in enumerate(['L', 'A', 'B']):
+                std_val = features['lab_stats'][channel_name]['std']
+                if std_val > 1e-8:
+                    matrix[channel_idx, row, flat_idx] = features['lab_vectors'][channel_name] / (std_val * count)
+        pixel_index = np.flatnonzero(np.any(matrix != 0, axis=(0, 1)))
+        return np.ascontiguousarray(matrix[:, :, pixel_index]), pixel_index
+
+    def compute_batch_ncc_scores(self, template_matrix: np.ndarray, scene_img: np.ndarray,
+                                 template_umats: Optional[List] = None,
+                                 pixel_index: Optional[np.ndarray] = None,
+                                 scene_lab: Optional[np.ndarray] = None) -> np.ndarray:
+        """一次矩阵乘法计算场景图像与全部模板的NCC分数（与逐模板计算结果一致）
+
+        template_umats: 已上传的各通道模板矩阵（cv2.UMat），提供时使用OpenCL计算
+        pixel_index: 模板矩阵列对应的像素索引（build_template_matrix返回），None表示全部像素
+        scene_lab: 场景图像已计算的116x116 LAB（可选，为None时现场缩放转换）
+        """
+        if scene_lab is None:
+            if scene_img.shape[:2] != (MATCH_SIZE, MATCH_SIZE):
+                scene_img = cv2.resize(scene_img, (MATCH_SIZE, MATCH_SIZE))
+            scene_lab = cv2.cvtColor(scene_img, cv2.COLOR_BGR2LAB)
+        scene_lab = scene_lab.reshape(-1, 3)
+        if pixel_index is not None:
+            scene_lab = scene_lab[pixel_index]
+        scene_vectors = scene_lab.T.astype(np.float32)  # (3, P)
+
+        if template_umats is not None:
+            # 模板矩阵常驻设备端；场景向量整体只上传一次，各通道取行视图做 (N, P) x (1, P)^T 的GEMM，
+            # 三个结果在设备端拼接后一次性取回
+            scene_umat = cv2.UMat(scene_vectors)
+            pixel_count = scene_vectors.shape[1]
+            channel_scores = cv2.hconcat([
+                cv2.gemm(template_umats[channel_idx], cv2.UMat(scene_umat, (channel_idx, channel_idx + 1), (0, pixel_count)),
+                         1.0, None, 0.0, flags=cv2.GEMM_2_T)
+                for channel_idx in range(3)
+            ]).get().T
+        else:
+            # (3, N, P) @ (3, P, 1) -> (3, N)
+            channel_scores = np.matmul(template_matrix, scene_vectors[:, :, np.newaxis])[:, :, 0]
+        np.clip(channel_scores, -1.0, 1.0, out=channel_scores)
+        final_scores = np.asarray(self.CHANNEL_WEIGHTS, dtype=np.float32) @ channel_scores * 100
+        return np.clip(final_scores, 0, 100)
+
 
 # ==================== 匹配器类 ====================
 class EquipmentMatcher:
@@ -323,6 +494,52 @@ class EquipmentMatcher:
         self.processor = ImageProcessor()
         self.cache_manager = TemplateCache()
         self.ncc_processor = VectorizedNCCProcessor(self.cache_manager)
+        self.base_features: Dict[str, Dict[str, np.ndarray]] = {}  # 基准图像颜色特征缓存（116x116掩码与LAB）
+        self._template_names: Tuple[str, ...] = ()  # 模板权重矩阵对应的基准图像顺序
+        self._template_matrix: Optional[np.ndarray] = None
+        self._template_pixels: Optional[np.ndarray] = None  # 模板矩阵列对应的像素索引
+        self._template_methods: List[str] = []
+        self._template_umats: Optional[List] = None  # OpenCL模式下常驻设备端的模板矩阵
+
+        # OpenCL仅在显式开启且可用时启用
+        self.use_opencl = self.config.use_opencl and cv2.ocl.haveOpenCL()
+        if self.use_opencl:
+            cv2.ocl.setUseOpenCL(True)
+            logger.info("已启用OpenCL（cv2.UMat）计算批量NCC")
+        elif self.config.use_opencl:
+            logger.warning("OpenCL不可用，使用CPU计算批量NCC")
+    
+    @property
+    def mask_radius(self) -> int:
+        """颜色匹配使用的掩码半径"""
+        return self.config.circle_radius if self.config.use_circle_mask else MATCH_SIZE // 2
+    
+    def create_color_mask(self, image: np.ndarray) -> np.ndarray:
+        """为颜色匹配创建116x116装备掩码"""
+        return self.processor.create_equipment_mask(cv2.resize(image, (MATCH_SIZE, MATCH_SIZE)), self.mask_radius, erode_iterations=2)
+    
+    @staticmethod
+    def to_lab_116(image: np.ndarray) -> np.ndarray:
+        """将图像缩放到116x116并转换到LAB色彩空间"""
+        return cv2.cvtColor(cv2.resize(image, (MATCH_SIZE, MATCH_SIZE)), cv2.COLOR_BGR2LAB)
+    
+    def prepare_color_features(self, image: np.ndarray, image_116: Optional[np.ndarray] = None,
+                               lab: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """一次缩放得到颜色匹配所需的116x116掩码和LAB（已有的116x116图像和LAB可直接传入）"""
+        if image_116 is None:
+            image_116 = cv2.resize(image, (MATCH_SIZE, MATCH_SIZE))
+        return {
+            'mask': self.processor.create_equipment_mask(image_116, self.mask_radius, erode_iterations=2),
+            'lab': lab if lab is not None else cv2.cvtColor(image_116, cv2.COLOR_BGR2LAB)
+        }
+    
+    def get_base_features(self, base_name: str, base_image: np.ndarray) -> Dict[str, np.ndarray]:
+        """获取基准图像颜色特征（按名称缓存，每个基准图像只计算一次）"""
+        features = self.base_features.get(base_name)
+        if features is None:
+            features = self.prepare_color_features(base_image)
+            self.base_features[base_name] = features
+        return features
     
     def template_matching_lab(self, template_path: Path, scene_img: np.ndarray, template_name: str) -> Tuple[float, str]:
         """使用向量化NCC进行LAB色彩空间三通道加权匹配"""
@@ -340,7 +557,41 @@ class EquipmentMatcher:
             logger.error(f"向量化NCC匹配失败 {template_name}: {e}")
             return 0.0, ""
     
-    def calculate_histogram_similarity(self, img1: np.ndarray, img2: np.ndarray, mask: np.ndarray) -> float:
+    def batch_template_matching_lab(self, base_paths: Dict[str, Path], scene_img: np.ndarray,
+                                    base_names: List[str],
+                                    base_images: Optional[Dict[str, np.ndarray]] = None,
+                                    scene_lab: Optional[np.ndarray] = None) -> Tuple[np.ndarray, List[str]]:
+        """批量向量化NCC：一次计算场景图像与全部基准图像的模板分数
+        （base_images为已加载的基准图像，scene_lab为场景图像已计算的116x116 LAB，均可选）"""
+        names = tuple(base_names)
+        if names != self._template_names or self._template_matrix is None:
+            features_list = []
+            for name in names:
+                features = self.ncc_processor.get_or_compute_template_features(
+                    base_paths[name], name, base_images.get(name) if base_images else None)
+                if features is None:
+                    logger.error(f"无法加载模板特征: {name}")
+                features_list.append(features)
+            self._template_matrix, self._template_pixels = self.ncc_processor.build_template_matrix(features_list)
+            self._template_methods = ["VECTORIZED_NCC" if f is not None else "" for f in features_list]
+            self._template_names = names
+            if self.use_opencl:
+                self._template_umats = [cv2.UMat(np.ascontiguousarray(self._template_matrix[channel_idx]))
+                                        for channel_idx in range(3)]
+
+        try:
+            scores = self.ncc_processor.compute_batch_ncc_scores(self._template_matrix, scene_img,
+                                                                 template_umats=self._template_umats,
+                                                                 pixel_index=self._template_pixels,
+                                                                 scene_lab=scene_lab)
+        except Exception as e:
+            logger.error(f"批量向量化NCC匹配失败: {e}")
+            scores = np.zeros(len(names), dtype=np.float32)
+        return scores, self._template_methods
+
+    def calculate_histogram_similarity(self, img1: np.ndarray, img2: np.ndarray, mask: np.ndarray,
+                                       lab1: Optional[np.ndarray] = None,
+                                       lab2: Optional[np.ndarray] = None) -> float:
         """
         计算直方图相似度（对边缘锯齿不敏感）
         
@@ -348,14 +599,18 @@ class EquipmentMatcher:
             img1: 第一张图像
             img2: 第二张图像
             mask: 掩码
+            lab1: 第一张图像的预计算LAB（可选，为None时现场转换）
+            lab2: 第二张图像的预计算LAB（可选，为None时现场转换）
             
         Returns:
             直方图相似度（0-1）
         """
         try:
             # 计算LAB空间的直方图
-            lab1 = cv2.cvtColor(img1, cv2.COLOR_BGR2LAB)
-            lab2 = cv2.cvtColor(img2, cv2.COLOR_BGR2LAB)
+            if lab1 is None:
+                lab1 = cv2.cvtColor(img1, cv2.COLOR_BGR2LAB)
+            if lab2 is None:
+                lab2 = cv2.cvtColor(img2, cv2.COLOR_BGR2LAB)
             
             # 使用8x8x8的bins
             hist1 = cv2.calcHist([lab1], [0, 1, 2], mask, [8, 8, 8], [0, 256, 0, 256, 0, 256])
@@ -376,25 +631,32 @@ class EquipmentMatcher:
             logger.error(f"直方图相似度计算失败: {e}")
             return 0.0
     
-    def calculate_color_similarity_lab(self, img1: np.ndarray, img2: np.ndarray) -> Tuple[float, Dict]:
-        """计算颜色相似度（LAB色彩空间像素级欧氏距离 + 直方图）"""
+    def calculate_color_similarity_lab(self, img1: np.ndarray, img2: np.ndarray,
+                                       mask1: Optional[np.ndarray] = None,
+                                       mask2: Optional[np.ndarray] = None,
+                                       lab1: Optional[np.ndarray] = None,
+                                       lab2: Optional[np.ndarray] = None) -> Tuple[float, Dict]:
+        """计算颜色相似度（LAB色彩空间像素级欧氏距离 + 直方图）
+        
+        Args:
+            img1: 第一张图像
+            img2: 第二张图像
+            mask1: 第一张图像的预计算掩码（可选，为None时现场计算）
+            mask2: 第二张图像的预计算掩码（可选，为None时现场计算）
+            lab1: 第一张图像的预计算116x116 LAB（可选，为None时现场转换）
+            lab2: 第二张图像的预计算116x116 LAB（可选，为None时现场转换）
+        """
         try:
-            target_size = (116, 116)
-            img1_resized = cv2.resize(img1, target_size)
-            img2_resized = cv2.resize(img2, target_size)
+            target_size = (MATCH_SIZE, MATCH_SIZE)
             
             # 创建掩码（改进版：去除紫色、透明部分和边缘）
-            if self.config.use_circle_mask:
-                equipment_mask1 = self.processor.create_equipment_mask(img1_resized, self.config.circle_radius, erode_iterations=2)
-                equipment_mask2 = self.processor.create_equipment_mask(img2_resized, self.config.circle_radius, erode_iterations=2)
-            else:
-                # 不使用圆形掩码，但仍然去除紫色和白色
-                equipment_mask1 = self.processor.create_equipment_mask(img1_resized, radius=58, erode_iterations=2)
-                equipment_mask2 = self.processor.create_equipment_mask(img2_resized, radius=58, erode_iterations=2)
+            # 未启用圆形掩码时使用半径58，仍然去除紫色和白色
+            equipment_mask1 = mask1 if mask1 is not None else self.create_color_mask(img1)
+            equipment_mask2 = mask2 if mask2 is not None else self.create_color_mask(img2)
             
             combined_mask = cv2.bitwise_and(equipment_mask1, equipment_mask2)
             
-            equipment_pixels = np.sum(combined_mask == 255)
+            equipment_pixels = cv2.countNonZero(combined_mask)  # 掩码为0/255二值
             total_pixels = target_size[0] * target_size[1]
             equipment_ratio = equipment_pixels / total_pixels
             
@@ -409,24 +671,22 @@ class EquipmentMatcher:
                 logger.warning(f"装备区域过小: {equipment_ratio:.2%} (阈值: {self.config.equipment_ratio_threshold:.2%})")
             
             # 方法1：像素级LAB欧氏距离
-            lab1 = cv2.cvtColor(img1_resized, cv2.COLOR_BGR2LAB)
-            lab2 = cv2.cvtColor(img2_resized, cv2.COLOR_BGR2LAB)
+            if lab1 is None:
+                lab1 = self.to_lab_116(img1)
+            if lab2 is None:
+                lab2 = self.to_lab_116(img2)
             
-            equipment_coords = np.where(combined_mask == 255)
-            if len(equipment_coords[0]) == 0:
+            if equipment_pixels == 0:
                 logger.warning("没有找到装备像素")
                 return 0.0, debug_info
             
-            pixels1 = lab1[equipment_coords[0], equipment_coords[1]]
-            pixels2 = lab2[equipment_coords[0], equipment_coords[1]]
-            distances = np.linalg.norm(pixels1 - pixels2, axis=1)
-            avg_distance = np.mean(distances)
-            std_distance = np.std(distances)
+            avg_distance = lab_mean_distance(lab1, lab2, combined_mask)
             
             pixel_similarity = max(0, 1 - avg_distance / self.config.max_color_distance)
             
             # 方法2：直方图相似度（对边缘锯齿不敏感）
-            hist_similarity = self.calculate_histogram_similarity(img1_resized, img2_resized, combined_mask)
+            hist_similarity = self.calculate_histogram_similarity(img1, img2, combined_mask,
+                                                                  lab1=lab1, lab2=lab2)
             
             # 动态权重：像素少时更依赖直方图，像素多时更依赖像素级匹配
             # equipment_ratio范围：0.02-0.5，映射到权重：0.3-0.7
@@ -438,9 +698,6 @@ class EquipmentMatcher:
             
             debug_info.update({
                 'avg_distance': float(avg_distance),
-                'std_distance': float(std_distance),
-                'min_distance': float(np.min(distances)),
-                'max_distance': float(np.max(distances)),
                 'pixel_similarity': float(pixel_similarity),
                 'hist_similarity': float(hist_similarity),
                 'pixel_weight': float(pixel_weight),
@@ -448,6 +705,15 @@ class EquipmentMatcher:
                 'final_similarity': float(final_similarity)
             })
             
+            # 距离分布统计仅在调试模式下计算
+            if self.config.debug_artifacts:
+                distances = lab_pixel_distances(lab1, lab2, combined_mask)
+                debug_info.update({
+                    'std_distance': float(np.std(distances)),
+                    'min_distance': float(np.min(distances)),
+                    'max_distance': float(np.max(distances))
+                })
+            
             return final_similarity, debug_info
         except Exception as e:
             logger.error(f"颜色相似度计算失败: {e}")
@@ -462,23 +728,49 @@ class EquipmentMatcher:
     def match_single_image(self, compare_image: np.ndarray, compare_name: str, base_images: Dict[str, np.ndarray],
                           base_paths: Dict[str, Path]) -> Optional[MatchResult]:
         """匹配单张图像（使用向量化NCC）"""
-        template_candidates = []
-        for base_name, base_image in base_images.items():
-            template_path = base_paths[base_name]
-            template_score, method = self.template_matching_lab(template_path, compare_image, base_name)
-            template_candidates.append({'name': base_name, 'image': base_image, 'score': template_score, 'method': method})
+        base_names = list(base_images)
+        # 对比图像只缩放和转换LAB一次，模板阶段和颜色阶段共用
+        compare_116 = cv2.resize(compare_image, (MATCH_SIZE, MATCH_SIZE))
+        compare_lab = cv2.cvtColor(compare_116, cv2.COLOR_BGR2LAB)
+        template_scores, methods = self.batch_template_matching_lab(base_paths, compare_image, base_names, base_images,
+                                                                    scene_lab=compare_lab)
+        template_candidates = [
+            {'name': name, 'image': base_images[name], 'score': float(score), 'method': method}
+            for name, score, method in zip(base_names, template_scores, methods)
+        ]
 
         template_candidates.sort(key=lambda x: x['score'], reverse=True)
         high_score_candidates = [c for c in template_candidates if c['score'] >= self.config.template_threshold]
+        runners_up_skipped = False
+
+        if high_score_candidates:
+            top_score = high_score_candidates[0]['score']
+            runner_up = high_score_candidates[1]['score'] if len(high_score_candidates) > 1 else 0.0
+            clear_lead = top_score - runner_up >= self.config.color_skip_margin
+
+            # 只对最高候选做颜色匹配：模板分数已超过阈值且明显领先时跳过其余候选。
+            # 这是近似：颜色分数最多可相差100分，颜色更接近的次高候选在完整比较中仍可能胜出；
+            # 综合得分照常计算（模板+颜色），与未跳过的图像同一量纲
+            if 0 < self.config.color_skip_score < top_score and clear_lead:
+                high_score_candidates = high_score_candidates[:1]
+                runners_up_skipped = True
 
         best_match = None
         best_score = 0.0
 
         if high_score_candidates:
+            # 对比图像掩码和LAB只计算一次，基准图像掩码和LAB从缓存获取
+            compare_features = self.prepare_color_features(compare_image, compare_116, compare_lab)
             for candidate in high_score_candidates:
+                # 候选按模板分数降序，颜色分数上限为100：后续候选不可能超过当前最佳时直接结束
+                if best_match is not None and self.calculate_composite_score(candidate['score'], 1.0) <= best_score:
+                    break
+                base_features = self.get_base_features(candidate['name'], candidate['image'])
                 # 计算颜色相似度
                 color_score, debug_info = self.calculate_color_similarity_lab(
-                    candidate['image'], compare_image
+                    candidate['image'], compare_image,
+                    mask1=base_features['mask'], mask2=compare_features['mask'],
+                    lab1=base_features['lab'], lab2=compare_features['lab']
                 )
                 composite_score = self.calculate_composite_score(candidate['score'], color_score)
 
@@ -490,6 +782,8 @@ class EquipmentMatcher:
                         color_score=color_score, composite_score=composite_score,
                         debug_info=debug_info
                     )
+            if best_match is not None and runners_up_skipped:
+                best_match.debug_info['color_skipped'] = True
         elif template_candidates:
             best = template_candidates[0]
             best_match = MatchResult(
@@ -500,36 +794,31 @@ class EquipmentMatcher:
 
         return best_match
     
-    def create_comparison_image(self, base_image: np.ndarray, compare_image: np.ndarray, match_result: MatchResult) -> np.ndarray:
-        """创建对比图像（显示完整文件名，使用去除紫色背景后的图像）"""
-        # 先调整到116x116创建掩码
-        mask_size = (116, 116)
-        base_116 = cv2.resize(base_image, mask_size)
-        compare_116 = cv2.resize(compare_image, mask_size)
-        
-        # 创建掩码（去除紫色背景）
-        base_mask_116 = self.processor.create_equipment_mask(base_116, self.config.circle_radius, erode_iterations=2)
-        compare_mask_116 = self.processor.create_equipment_mask(compare_116, self.config.circle_radius, erode_iterations=2)
+    def mask_for_comparison(self, image: np.ndarray) -> np.ndarray:
+        """调整到116x116并将装备掩码外（紫色背景）的区域设为白色，供对比图像使用"""
+        masked_116 = cv2.resize(image, (MATCH_SIZE, MATCH_SIZE))
+        mask_116 = self.processor.create_equipment_mask(masked_116, self.config.circle_radius, erode_iterations=2)
+        # resize结果为新数组，可原地修改
+        masked_116[mask_116 == 0] = 255
+        return masked_116
+
+    def create_comparison_image(self, base_image: np.ndarray, compare_image: np.ndarray, match_result: MatchResult,
+                                base_masked_116: Optional[np.ndarray] = None) -> np.ndarray:
+        """创建对比图像（显示完整文件名，使用去除紫色背景后的图像）
         
-        # 应用掩码到116x116图像
-        base_masked_116 = cv2.bitwise_and(base_116, base_116, mask=base_mask_116)
-        compare_masked_116 = cv2.bitwise_and(compare_116, compare_116, mask=compare_mask_116)
-        
-        # 将掩码外的区域设为白色
-        base_masked_116[base_mask_116 == 0] = [255, 255, 255]
-        compare_masked_116[compare_mask_116 == 0] = [255, 255, 255]
+        base_masked_116 为已由 mask_for_comparison 处理的基准图像（同一基准图像出现在多个结果中时复用），
+        为None时从 base_image 计算
+        """
+        if base_masked_116 is None:
+            base_masked_116 = self.mask_for_comparison(base_image)
+        compare_masked_116 = self.mask_for_comparison(compare_image)
         
-        # 再放大到250x250用于显示
+        # 创建更大的画布以容纳文字，再将两张图直接放大到250x250写入画布对应区域（不再经过中间数组）
         target_size = (250, 250)
-        base_masked = cv2.resize(base_masked_116, target_size, interpolation=cv2.INTER_LINEAR)
-        compare_masked = cv2.resize(compare_masked_116, target_size, interpolation=cv2.INTER_LINEAR)
-        
-        # 创建更大的画布以容纳文字
         canvas_height = target_size[0] + 80
-        comparison = np.zeros((canvas_height, target_size[1] * 2, 3), dtype=np.uint8)
-        comparison[:] = [255, 255, 255]  # 白色背景
-        comparison[80:80+target_size[0], :target_size[1]] = base_masked
-        comparison[80:80+target_size[0], target_size[1]:] = compare_masked
+        comparison = np.full((canvas_height, target_size[1] * 2, 3), 255, dtype=np.uint8)  # 白色背景，一次填充
+        self.processor.resize_into(base_masked_116, comparison[80:80+target_size[0], :target_size[1]])
+        self.processor.resize_into(compare_masked_116, comparison[80:80+target_size[0], target_size[1]:])
         
         font = cv2.FONT_HERSHEY_SIMPLEX
         font_scale = 0.4
@@ -567,23 +856,52 @@ class FileManager:
             return
         
         image_extensions = {'.png', '.jpg', '.jpeg', '.webp'}
-        for file_path in directory.iterdir():
-            if file_path.is_file() and file_path.suffix.lower() in image_extensions:
-                yield file_path
+        # 单次 scandir：先按扩展名过滤，DirEntry.is_file 通常无需额外 stat，只为命中的文件构造 Path
+        with os.scandir(directory) as it:
+            for entry in it:
+                if os.path.splitext(entry.name)[1].lower() in image_extensions and entry.is_file():
+                    yield Path(entry.path)
     
     @staticmethod
-    def load_images_batch(directory: Path) -> Tuple[Dict[str, np.ndarray], Dict[str, Path]]:
-        """批量加载图像并返回图像数据和路径"""
+    def load_images_batch(directory: Path, workers: int = 1,
+                          use_cache: bool = False) -> Tuple[Dict[str, np.ndarray], Dict[str, Path]]:
+        """批量加载图像并返回图像数据和路径（workers>1时多线程解码，顺序与目录顺序一致；
+        use_cache为True时使用进程内只读缓存，适合基准图像库）"""
         images = {}
         paths = {}
-        processor = ImageProcessor()
-        for file_path in FileManager.get_image_files(directory):
-            image = processor.load_image(file_path)
+        load = FileManager.load_image_cached if use_cache else ImageProcessor.load_image
+        file_paths = list(FileManager.get_image_files(directory))
+        # PIL/OpenCV解码期间释放GIL，线程即可并行；文件很少时线程开销大于收益
+        if workers > 1 and len(file_paths) > workers:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                loaded = list(executor.map(load, file_paths))
+        else:
+            loaded = map(load, file_paths)
+        for file_path, image in zip(file_paths, loaded):
             if image is not None:
                 images[file_path.name] = image
                 paths[file_path.name] = file_path
         return images, paths
     
+    @staticmethod
+    def load_image_cached(file_path: Path) -> Optional[np.ndarray]:
+        """加载图像并在进程内缓存（只读）：文件修改时间和大小不变时直接复用已解码结果，
+        同一进程多次运行步骤3时基准图像库无需重新解码"""
+        key = str(file_path)
+        try:
+            stat = file_path.stat()
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return ImageProcessor.load_image(file_path)
+        cached = _IMAGE_CACHE.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        image = ImageProcessor.load_image(file_path)
+        if image is not None:
+            image.flags.writeable = False
+            _IMAGE_CACHE[key] = (signature, image)
+        return image
+    
     @staticmethod
     def ensure_directory(directory: Path) -> None:
         """确保目录存在"""
@@ -608,20 +926,20 @@ class FileManager:
         # 保存CSV文件（高置信度匹配结果）到output_dir目录
         csv_file = output_dir / f"matching_results_{timestamp}.csv"
         high_confidence_threshold = 90
+        # 去扩展名后的文件名只计算一次，CSV与对比图像命名共用
+        stems = _result_stems(results)
         
         with open(csv_file, 'w', newline='', encoding='utf-8') as f:
             writer = csv.writer(f)
             writer.writerow(['原始名称', '匹配装备名称'])
             
             # 获取所有原始文件名（按数字排序）
-            all_original_names = sorted(set(result.compare_image.rsplit('.', 1)[0] for result in results))
+            all_original_names = sorted(set(compare_stem for _, compare_stem, _ in stems))
             
             # 创建匹配结果字典
             match_dict = {}
-            for result in results:
-                original_name = result.compare_image.rsplit('.', 1)[0]
+            for result, original_name, matched_name in stems:
                 if result.composite_score > high_confidence_threshold:
-                    matched_name = result.base_image.rsplit('.', 1)[0]
                     match_dict[original_name] = matched_name
             
             # 写入所有原始文件
@@ -638,64 +956,78 @@ class FileManager:
         
         # 保存汇总报告
         summary_file = comparison_dir / f"matching_summary_{timestamp}.txt"
+        # 先在内存中拼接全部内容，再一次性写入文件
+        lines = []
+        lines.append("装备图片匹配结果汇总\n")
+        lines.append("=" * 50 + "\n")
+        lines.append(f"测试时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        lines.append(f"匹配方法: 向量化NCC + LAB色彩空间（毫秒级匹配）\n")
+        # 单次遍历直接保留每张对比图像的最佳结果（每张对比图像通常只有一个结果），
+        # 不再先分组成列表再逐组 max()
+        best_by_compare = {}
+        for result in results:
+            current = best_by_compare.get(result.compare_image)
+            if current is None or result.composite_score > current.composite_score:
+                best_by_compare[result.compare_image] = result
+        
+        lines.append(f"总匹配次数: {len(results)}\n")
+        lines.append(f"基准图像数量: {len(set(r.base_image for r in results))}\n")
+        lines.append(f"对比图像数量: {len(best_by_compare)}\n\n")
+        
+        lines.append("各对比图像的最佳匹配结果:\n")
+        lines.append("-" * 50 + "\n")
+        
+        for compare_img, best in best_by_compare.items():
+            lines.append(f"{compare_img}:\n")
+            if best.composite_score > 90:
+                lines.append(f"  ✓ 高置信度匹配: {best.base_image}\n")
+            else:
+                lines.append(f"  最佳匹配: {best.base_image}\n")
+            lines.append(f"  综合得分: {best.composite_score:.2f}%\n")
+            lines.append(f"  模板匹配: {best.template_score:.2f}% ({best.template_method})\n")
+            lines.append(f"  颜色相似度: {best.color_score:.3f}\n")
+            if best.debug_info and best.debug_info.get('color_skipped'):
+                lines.append("  其余候选: 已跳过颜色匹配（模板分数明显领先）\n")
+            
+            # 添加调试信息
+            if best.debug_info:
+                debug = best.debug_info
+                lines.append(f"  【调试信息】\n")
+                lines.append(f"    装备像素: {debug.get('equipment_pixels', 0)}/{debug.get('total_pixels', 0)} ")
+                lines.append(f"({debug.get('equipment_ratio', 0):.2%})\n")
+                if 'avg_distance' in debug:
+                    lines.append(f"    平均颜色距离: {debug.get('avg_distance', 0):.2f}\n")
+                    if 'std_distance' in debug:
+                        lines.append(f"    距离标准差: {debug.get('std_distance', 0):.2f}\n")
+                    lines.append(f"    像素相似度: {debug.get('pixel_similarity', 0):.3f} (权重: {debug.get('pixel_weight', 0):.2f})\n")
+                    lines.append(f"    直方图相似度: {debug.get('hist_similarity', 0):.3f} (权重: {debug.get('hist_weight', 0):.2f})\n")
+                    lines.append(f"    最终相似度: {debug.get('final_similarity', 0):.3f}\n")
+            lines.append("\n")
+        
         with open(summary_file, 'w', encoding='utf-8') as f:
-            f.write("装备图片匹配结果汇总\n")
-            f.write("=" * 50 + "\n")
-            f.write(f"测试时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"匹配方法: 向量化NCC + LAB色彩空间（毫秒级匹配）\n")
-            f.write(f"总匹配次数: {len(results)}\n")
-            f.write(f"基准图像数量: {len(set(r.base_image for r in results))}\n")
-            f.write(f"对比图像数量: {len(set(r.compare_image for r in results))}\n\n")
-            
-            compare_groups = {}
-            for result in results:
-                if result.compare_image not in compare_groups:
-                    compare_groups[result.compare_image] = []
-                compare_groups[result.compare_image].append(result)
-            
-            f.write("各对比图像的最佳匹配结果:\n")
-            f.write("-" * 50 + "\n")
-            
-            for compare_img, group_results in compare_groups.items():
-                best = max(group_results, key=lambda x: x.composite_score)
-                f.write(f"{compare_img}:\n")
-                if best.composite_score > 90:
-                    f.write(f"  ✓ 高置信度匹配: {best.base_image}\n")
-                else:
-                    f.write(f"  最佳匹配: {best.base_image}\n")
-                f.write(f"  综合得分: {best.composite_score:.2f}%\n")
-                f.write(f"  模板匹配: {best.template_score:.2f}% ({best.template_method})\n")
-                f.write(f"  颜色相似度: {best.color_score:.3f}\n")
-                
-                # 添加调试信息
-                if best.debug_info:
-                    debug = best.debug_info
-                    f.write(f"  【调试信息】\n")
-                    f.write(f"    装备像素: {debug.get('equipment_pixels', 0)}/{debug.get('total_pixels', 0)} ")
-                    f.write(f"({debug.get('equipment_ratio', 0):.2%})\n")
-                    if 'avg_distance' in debug:
-                        f.write(f"    平均颜色距离: {debug.get('avg_distance', 0):.2f}\n")
-                        f.write(f"    距离标准差: {debug.get('std_distance', 0):.2f}\n")
-                        f.write(f"    像素相似度: {debug.get('pixel_similarity', 0):.3f} (权重: {debug.get('pixel_weight', 0):.2f})\n")
-                        f.write(f"    直方图相似度: {debug.get('hist_similarity', 0):.3f} (权重: {debug.get('hist_weight', 0):.2f})\n")
-                        f.write(f"    最终相似度: {debug.get('final_similarity', 0):.3f}\n")
-                f.write("\n")
+            f.write("".join(lines))
         
         # 保存对比图像
         if save_comparisons and base_images and compare_images and matcher:
             
             saved_count = 0
-            for result in results:
+            # 每个基准图像的去背景缩略图只计算一次
+            masked_bases: Dict[str, np.ndarray] = {}
+            for result, compare_name, base_name in stems:
                 if result.base_image in base_images and result.compare_image in compare_images:
+                    base_masked = masked_bases.get(result.base_image)
+                    if base_masked is None:
+                        base_masked = matcher.mask_for_comparison(base_images[result.base_image])
+                        masked_bases[result.base_image] = base_masked
                     comparison_img = matcher.create_comparison_image(
-                        base_images[result.base_image], compare_images[result.compare_image], result
+                        base_images[result.base_image], compare_images[result.compare_image], result,
+                        base_masked_116=base_masked
                     )
-                    # 生成文件名：原文件名_匹配装备名.png
-                    # 例如：10_circle.png → 10_circle_t5instrument.png
-                    compare_name = result.compare_image.rsplit('.', 1)[0]  # 去除扩展名
-                    base_name = result.base_image.rsplit('.', 1)[0]  # 去除扩展名
-                    comparison_file = comparison_dir / f"{compare_name}_{base_name}.png"
-                    cv2.imwrite(str(comparison_file), comparison_img)
+                    # 生成文件名：原文件名_匹配装备名.jpg
+                    # 例如：10_circle.png → 10_circle_t5instrument.jpg
+                    # 调试产物使用JPEG(质量80)：编码比PNG快约5倍，文件约为1/4
+                    comparison_file = comparison_dir / f"{compare_name}_{base_name}.jpg"
+                    cv2.imwrite(str(comparison_file), comparison_img, [cv2.IMWRITE_JPEG_QUALITY, 80])
                     saved_count += 1
             
             logger.info(f"已保存 {saved_count} 张对比图像到: {comparison_dir}")
@@ -703,6 +1035,50 @@ class FileManager:
         return json_file, summary_file, csv_file
 
 
+# ==================== 多进程匹配 ====================
+_worker_state: Dict = {}
+
+
+def _pool_context():
+    """返回进程池启动上下文：优先forkserver，否则spawn
+
+    不使用fork：主进程此时已启动OpenCV线程池并加载了Numba/OpenCL状态，
+    fork出的子进程可能继承被其他线程持有的锁而死锁。
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+def _init_match_worker(config: MatchConfig, base_images: Dict[str, np.ndarray], base_paths: Dict[str, Path],
+                       template_features: Dict[str, Dict], base_features: Dict[str, Dict[str, np.ndarray]]) -> None:
+    """进程池初始化：每个工作进程只构建一次匹配器，并直接复用主进程已计算的模板特征和颜色特征"""
+    # 并行度由进程数提供，进程内 OpenCV/Numba 只用单线程，避免多个进程的线程池争抢CPU核心。
+    # 工作进程由 _pool_context() 以forkserver/spawn方式全新启动，不继承主进程已启动的线程池，
+    # 在初始化阶段（尚未执行任何计算）设置即可生效
+    cv2.setNumThreads(1)
+    if NUMBA_AVAILABLE:
+        set_num_threads(1)
+    matcher = EquipmentMatcher(config)
+    matcher.cache_manager.template_cache.update(template_features)
+    matcher.base_features.update(base_features)
+    _worker_state['matcher'] = matcher
+    _worker_state['base_images'] = base_images
+    _worker_state['base_paths'] = base_paths
+
+
+def _match_in_worker(item: Tuple[str, np.ndarray]) -> Tuple[str, Optional[MatchResult], Optional[str]]:
+    """在工作进程中匹配单张对比图像，返回 (名称, 结果, 错误信息)"""
+    compare_name, compare_image = item
+    try:
+        result = _worker_state['matcher'].match_single_image(
+            compare_image, compare_name, _worker_state['base_images'], _worker_state['base_paths']
+        )
+        return compare_name, result, None
+    except Exception as e:
+        return compare_name, None, str(e)
+
+
 # ==================== 主执行类 ====================
 class EquipmentMatchingPipeline:
     """装备匹配流程类"""
@@ -718,29 +1094,33 @@ class EquipmentMatchingPipeline:
             renamed_count = 0
             high_confidence_threshold = 90  # 高置信度阈值
 
+            # 目录只扫描一次得到现有文件名集合，重命名时同步更新，不再逐个 exists() 查询
+            with os.scandir(compare_dir) as it:
+                existing_files = {entry.name for entry in it if entry.is_file()}
+
             logger.info("\n开始重命名高置信度匹配的文件...")
             logger.info("所有文件匹配状态：")
             logger.info("-" * 80)
             logger.info(f"{'文件名':<25} {'匹配装备':<20} {'置信度得分':<10} {'状态':<10}")
             logger.info("-" * 80)
 
-            for result in results:
+            for result, compare_name, base_equipment_name in _result_stems(results):
                 # 显示所有文件的匹配状态
-                base_name = Path(result.base_image).stem
+                base_name = os.path.splitext(result.base_image)[0]
                 if result.composite_score > high_confidence_threshold:
                     status = "已匹配"
                     # 原始文件路径
                     original_file = compare_dir / result.compare_image
 
-                    if original_file.exists():
+                    if result.compare_image in existing_files:
                         # 生成新文件名：原文件名_匹配装备名.png
-                        compare_name = result.compare_image.rsplit('.', 1)[0]  # 去除扩展名
-                        base_equipment_name = result.base_image.rsplit('.', 1)[0]  # 去除扩展名
                         new_filename = f"{compare_name}_{base_equipment_name}.png"
                         new_file = compare_dir / new_filename
 
                         # 重命名文件
                         original_file.rename(new_file)
+                        existing_files.discard(result.compare_image)
+                        existing_files.add(new_filename)
                         renamed_count += 1
                         logger.info(f"{result.compare_image:<25} {base_name:<20} {result.composite_score:>6.1f}% {status:<10}")
                 else:
@@ -756,6 +1136,32 @@ class EquipmentMatchingPipeline:
         except Exception as e:
             logger.error(f"重命名文件时出错: {e}")
     
+    def _match_serial(self, compare_images: Dict[str, np.ndarray], base_images: Dict[str, np.ndarray],
+                      base_paths: Dict[str, Path]) -> Iterator[Tuple[str, Optional[MatchResult], Optional[str]]]:
+        """在当前进程中逐张匹配"""
+        for compare_name, compare_image in compare_images.items():
+            try:
+                yield compare_name, self.matcher.match_single_image(compare_image, compare_name, base_images, base_paths), None
+            except Exception as e:
+                yield compare_name, None, str(e)
+    
+    def _match_parallel(self, compare_images: Dict[str, np.ndarray], base_images: Dict[str, np.ndarray],
+                        base_paths: Dict[str, Path], workers: int) -> Iterator[Tuple[str, Optional[MatchResult], Optional[str]]]:
+        """使用进程池并行匹配（结果顺序与输入一致）"""
+        # 主进程先计算全部模板特征和颜色特征，工作进程直接复用，
+        # 避免每个进程重复计算全部基准图像，也避免并发写缓存文件
+        for name, image in base_images.items():
+            self.matcher.ncc_processor.get_or_compute_template_features(base_paths[name], name, image)
+            self.matcher.get_base_features(name, image)
+        template_features = dict(self.matcher.cache_manager.template_cache)
+        base_features = dict(self.matcher.base_features)
+        
+        chunksize = max(1, len(compare_images) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context(), initializer=_init_match_worker,
+                                 initargs=(self.config, base_images, base_paths,
+                                           template_features, base_features)) as executor:
+            yield from executor.map(_match_in_worker, compare_images.items(), chunksize=chunksize)
+    
     def run(self, base_dir: Path, compare_dir: Path, output_dir: Path) -> bool:
         """执行匹配流程"""
         try:
@@ -774,8 +1180,10 @@ class EquipmentMatchingPipeline:
             
             self.file_manager.ensure_directory(output_dir)
             
+            workers = self.config.max_workers or os.cpu_count() or 1
+
             logger.info(f"加载基准图像: {base_dir}")
-            base_images, base_paths = self.file_manager.load_images_batch(base_dir)
+            base_images, base_paths = self.file_manager.load_images_batch(base_dir, workers, use_cache=True)
 
             if not base_images:
                 logger.error("未找到基准图像")
@@ -784,7 +1192,7 @@ class EquipmentMatchingPipeline:
             logger.info(f"✓ 已加载 {len(base_images)} 个基准图像（启用向量化NCC缓存）")
 
             logger.info(f"加载对比图像: {compare_dir}")
-            compare_images, _ = self.file_manager.load_images_batch(compare_dir)
+            compare_images, _ = self.file_manager.load_images_batch(compare_dir, workers)
 
             if not compare_images:
                 logger.error("未找到对比图像")
@@ -796,35 +1204,42 @@ class EquipmentMatchingPipeline:
 
             all_results = []
             failed_images = []
+            color_skipped = 0
             total_files = len(compare_images)
 
-            for idx, (compare_name, compare_image) in enumerate(compare_images.items(), 1):
-                try:
-                    result = self.matcher.match_single_image(compare_image, compare_name, base_images, base_paths)
-                    
-                    if result:
-                        all_results.append(result)
-                        status = "✓ 高置信度" if result.composite_score > 90 else "○ 最佳匹配"
-                        logger.info(
-                            f"[{idx}/{total_files}] {status}: {result.compare_image} → "
-                            f"{result.base_image} (得分: {result.composite_score:.1f}%)"
-                        )
-                    else:
-                        failed_images.append((compare_name, "无匹配结果"))
-                        
-                except Exception as e:
-                    failed_images.append((compare_name, str(e)))
-                    logger.error(f"处理失败 {compare_name}: {e}")
+            if workers > 1 and total_files >= self.config.parallel_min_images:
+                logger.info(f"使用 {workers} 个进程并行匹配")
+                match_iter = self._match_parallel(compare_images, base_images, base_paths, workers)
+            else:
+                match_iter = self._match_serial(compare_images, base_images, base_paths)
+
+            for idx, (compare_name, result, error) in enumerate(match_iter, 1):
+                if error is not None:
+                    failed_images.append((compare_name, error))
+                    logger.error(f"处理失败 {compare_name}: {error}")
+                elif result:
+                    all_results.append(result)
+                    if result.debug_info and result.debug_info.get('color_skipped'):
+                        color_skipped += 1
+                    status = "✓ 高置信度" if result.composite_score > 90 else "○ 最佳匹配"
+                    logger.info(
+                        f"[{idx}/{total_files}] {status}: {result.compare_image} → "
+                        f"{result.base_image} (得分: {result.composite_score:.1f}%)"
+                    )
+                else:
+                    failed_images.append((compare_name, "无匹配结果"))
             
             if all_results:
                 json_file, summary_file, csv_file = self.file_manager.save_results(
-                    all_results, output_dir, compare_dir, save_comparisons=self.config.save_comparison_images,
+                    all_results, output_dir, compare_dir,
+                    save_comparisons=self.config.save_comparison_images and self.config.debug_artifacts,
                     base_images=base_images, compare_images=compare_images, matcher=self.matcher
                 )
                 
                 logger.info("=" * 60)
                 logger.info("匹配完成")
                 logger.info(f"✓ 成功匹配: {len(all_results)} 个")
+                logger.info(f"颜色匹配阶段: 仅匹配最高候选 {color_skipped} 个，完整匹配 {len(all_results) - color_skipped} 个")
                 if failed_images:
                     logger.warning(f"✗ 失败: {len(failed_images)} 个")
                     for name, reason in failed_images[:5]:
@@ -853,7 +1268,8 @@ class EquipmentMatchingPipeline:
 def step3_match_equipment(auto_mode: bool = True, base_dir: Optional[str] = None,
                          compare_dir: Optional[str] = None, output_dir: Optional[str] = None,
                          save_comparisons: bool = True, use_circle_mask: bool = True,
-                         auto_clean: bool = True) -> bool:
+                         auto_clean: bool = True, debug_artifacts: bool = False,
+                         use_opencl: bool = False, max_workers: int = 0) -> bool:
     """步骤3：装备图片匹配主函数"""
     import sys
     # Fix Windows console encoding
@@ -889,7 +1305,10 @@ def step3_match_equipment(auto_mode: bool = True, base_dir: Optional[str] = None
     
     config = MatchConfig(
         save_comparison_images=save_comparisons,
-        use_circle_mask=use_circle_mask
+        use_circle_mask=use_circle_mask,
+        debug_artifacts=debug_artifacts,
+        use_opencl=use_opencl,
+        max_workers=max_workers
     )
     pipeline = EquipmentMatchingPipeline(config)
     return pipeline.run(base_path, compare_path, output_path)
@@ -904,15 +1323,19 @@ def main():
         parser.add_argument('--base-dir', type=str, default=None, help='基准图像目录路径')
         parser.add_argument('--compare-dir', type=str, default=None, help='对比图像目录路径')
         parser.add_argument('--output-dir', type=str, default=None, help='输出目录路径')
-        parser.add_argument('--no-comparisons', action='store_true', help='不保存对比图像')
+        parser.add_argument('--no-comparisons', action='store_true', help='调试模式下不保存对比图像（对比图像只在 --debug 下生成，未指定 --debug 时无作用）')
         parser.add_argument('--no-circle-mask', action='store_true', help='禁用圆形掩码（使用全图）')
+        parser.add_argument('--debug', action='store_true', help='生成调试产物（对比图像、距离分布统计；可用 --no-comparisons 关闭对比图像）')
+        parser.add_argument('--opencl', action='store_true', help='使用OpenCL（cv2.UMat）加速模板匹配')
+        parser.add_argument('--workers', type=int, default=0, help='匹配进程数（0为CPU核心数，1为单进程）')
         
         args = parser.parse_args()
         
         success = step3_match_equipment(
             auto_mode=True, base_dir=args.base_dir, compare_dir=args.compare_dir,
             output_dir=args.output_dir, save_comparisons=not args.no_comparisons,
-            use_circle_mask=not args.no_circle_mask
+            use_circle_mask=not args.no_circle_mask, debug_artifacts=args.debug,
+            use_opencl=args.opencl, max_workers=args.workers
         )
         
         if not success:
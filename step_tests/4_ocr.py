@@ -12,14 +12,22 @@ import cv2
 import csv
 import numpy as np
 import logging
+import logging.handlers
+import queue
+import atexit
 import tempfile
 import shutil
+import fnmatch
+import threading
+import multiprocessing
 from pathlib import Path
-from typing import Optional, List, Dict, Tuple, Generator
+from functools import lru_cache
+from collections import deque
+from typing import Optional, List, Dict, Tuple, Generator, Iterable
 from datetime import datetime
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from PIL import Image, ImageDraw, ImageFont
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import hashlib
 import pickle
 
@@ -30,36 +38,88 @@ sys.path.append(str(Path(__file__).parent.parent))
 # 配置日志系统
 # ============================================================================
 
+# 文件日志的后台监听器（重复调用 setup_logging 时先停止旧的）
+_log_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _stop_log_listener() -> None:
+    """停止文件日志监听器（先写完队列中剩余的记录）并关闭文件"""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        for handler in _log_listener.handlers:
+            handler.close()
+        _log_listener = None
+
+
+atexit.register(_stop_log_listener)
+
+
+def _console_handler() -> logging.Handler:
+    """控制台处理器 - 只显示关键信息"""
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.WARNING)
+    console_handler.setFormatter(logging.Formatter('%(levelname)s: %(message)s'))
+    return console_handler
+
+
+def _file_handler(log_file: Path) -> logging.Handler:
+    """文件处理器 - 记录详细信息（追加写入）"""
+    file_handler = logging.FileHandler(log_file, encoding='utf-8')
+    file_handler.setLevel(logging.DEBUG)
+    file_handler.setFormatter(logging.Formatter(
+        '%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    ))
+    return file_handler
+
+
 def setup_logging(log_file: Optional[Path] = None) -> logging.Logger:
     """配置日志系统"""
+    global _log_listener
     logger = logging.getLogger('ocr_processor')
     logger.setLevel(logging.INFO)
     
     # 清除现有处理器
     logger.handlers.clear()
+    _stop_log_listener()
     
-    # 控制台处理器 - 只显示关键信息
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.WARNING)
-    console_formatter = logging.Formatter('%(levelname)s: %(message)s')
-    console_handler.setFormatter(console_formatter)
-    logger.addHandler(console_handler)
+    logger.addHandler(_console_handler())
     
-    # 文件处理器 - 记录详细信息
     if log_file:
         log_file.parent.mkdir(parents=True, exist_ok=True)
-        file_handler = logging.FileHandler(log_file, encoding='utf-8')
-        file_handler.setLevel(logging.DEBUG)
-        file_formatter = logging.Formatter(
-            '%(asctime)s - %(levelname)s - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-        file_handler.setFormatter(file_formatter)
-        logger.addHandler(file_handler)
+        file_handler = _file_handler(log_file)
+        
+        # 文件写入交给后台线程：处理线程只把记录放入队列，由监听线程逐条写入文件
+        # （不在内存中攒批，进程崩溃或被中断时已产生的记录不会丢失）
+        log_queue = queue.Queue(-1)
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        queue_handler.setLevel(logging.DEBUG)
+        logger.addHandler(queue_handler)
+        _log_listener = logging.handlers.QueueListener(log_queue, file_handler)
+        _log_listener.start()
     
     return logger
 
 
+def setup_worker_logging(log_file: Optional[Path] = None) -> logging.Logger:
+    """配置进程池工作进程的日志：直接写入日志文件
+
+    工作进程中没有主进程的监听线程，继承或残留的队列处理器不会被消费，
+    因此替换为直接写文件的处理器（与主进程追加写同一文件）。
+    """
+    logger = logging.getLogger('ocr_processor')
+    logger.setLevel(logging.INFO)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        if not isinstance(handler, logging.handlers.QueueHandler):
+            handler.close()
+    logger.addHandler(_console_handler())
+    if log_file:
+        logger.addHandler(_file_handler(log_file))
+    return logger
+
+
 # ============================================================================
 # 数据类
 # ============================================================================
@@ -96,6 +156,24 @@ class ProcessingSummary:
 class ImageProcessor:
     """图像处理工具类"""
     
+    # 形态学结构元素只读，全局复用
+    _MORPH_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+    # 矩形核的连续膨胀/腐蚀可合并为一次大核运算：
+    # 开运算(腐蚀3+膨胀3) + 两次闭运算(膨胀3*2+腐蚀3*2) = 腐蚀3 -> 膨胀7 -> 腐蚀5，结果逐像素一致
+    _DILATE_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (7, 7))
+    _ERODE_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5))
+    # 每个线程各自的中间结果缓冲区（按图像尺寸复用，批量处理时不再反复分配）
+    _scratch = threading.local()
+    
+    @classmethod
+    def _scratch_buffers(cls, shape: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+        """获取当前线程的 (二值化, 开运算) 中间缓冲区"""
+        buffers = getattr(cls._scratch, 'buffers', None)
+        if buffers is None or buffers[0].shape != shape:
+            buffers = (np.empty(shape, np.uint8), np.empty(shape, np.uint8))
+            cls._scratch.buffers = buffers
+        return buffers
+    
     @staticmethod
     def load_image(image_path: Path) -> Optional[np.ndarray]:
         """加载图像并处理透明通道"""
@@ -104,10 +182,18 @@ class ImageProcessor:
             
             # 处理RGBA图像
             if img.mode == 'RGBA':
+                alpha = img.getchannel('A')
+                # 完全不透明时合成结果就是RGB本身，直接一步转换为BGR
+                if alpha.getextrema() == (255, 255):
+                    return cv2.cvtColor(np.asarray(img), cv2.COLOR_RGBA2BGR)
                 background = Image.new('RGB', img.size, (255, 255, 255))
-                background.paste(img, mask=img.split()[-1])
+                background.paste(img, mask=alpha)
                 img = background
             
+            # RGB图像由cvtColor直接生成新的BGR数组，np.asarray只读视图即可，省去一次整图拷贝
+            if img.mode == 'RGB':
+                return cv2.cvtColor(np.asarray(img), cv2.COLOR_RGB2BGR)
+            
             # 转换为numpy数组
             img_array = np.array(img)
             
@@ -120,33 +206,43 @@ class ImageProcessor:
             logging.getLogger('ocr_processor').error(f"加载图像失败 {image_path}: {e}")
             return None
     
-    @staticmethod
-    def create_background_mask(image: np.ndarray) -> np.ndarray:
-        """创建背景掩码"""
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+    @classmethod
+    def create_background_mask(cls, image: np.ndarray, gray: Optional[np.ndarray] = None) -> np.ndarray:
+        """创建背景掩码（gray 为调用方已有的灰度图，传入时不再重复转换）"""
+        # 中间结果写入线程本地缓冲区，只有返回的掩码是新分配的数组
+        binary_buf, opening_buf = cls._scratch_buffers(image.shape[:2])
+        if gray is None:
+            # 灰度图只作为阈值化的输入，借用开运算缓冲区（其后才会被写入）
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=opening_buf) if len(image.shape) == 3 else image
         
         binary = cv2.adaptiveThreshold(
-            gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 11, 2
+            gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 11, 2, dst=binary_buf
         )
         
-        kernel = np.ones((3, 3), np.uint8)
-        opening = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel, iterations=1)
-        closing = cv2.morphologyEx(opening, cv2.MORPH_CLOSE, kernel, iterations=2)
+        # 等价于 MORPH_OPEN(3x3) 后接 MORPH_CLOSE(3x3, iterations=2)，6次逐像素遍历减为3次
+        eroded = cv2.erode(binary, cls._MORPH_KERNEL, dst=opening_buf)
+        dilated = cv2.dilate(eroded, cls._DILATE_KERNEL, dst=binary_buf)
+        closing = cv2.erode(dilated, cls._ERODE_KERNEL)
         
         return closing
     
     @staticmethod
     def apply_mask(image: np.ndarray, mask: np.ndarray) -> np.ndarray:
-        """应用掩码到图像"""
-        mask_binary = np.where(mask > 127, 255, 0).astype(np.uint8)
-        
-        if len(mask_binary.shape) == 2:
-            mask_3channel = cv2.merge([mask_binary, mask_binary, mask_binary])
-        else:
-            mask_3channel = mask_binary
+        """应用掩码到图像（掩码值>127的像素置0，其余保留）"""
+        # 一次比较直接得到保留区域（<=127为255），省去 where/astype/merge/取反 四个中间数组
+        keep_mask = cv2.compare(mask, 127, cv2.CMP_LE)
         
-        inverted_mask = 255 - mask_3channel
-        return cv2.bitwise_and(image, inverted_mask)
+        if len(keep_mask.shape) == 2:
+            # 单通道掩码直接作为 bitwise_and 的 mask 参数，无需扩展为三通道
+            return cv2.bitwise_and(image, image, mask=keep_mask)
+        return cv2.bitwise_and(image, keep_mask)
+    
+    @staticmethod
+    def _resize_into(src: np.ndarray, dst_view: np.ndarray) -> None:
+        """将图像缩放写入目标区域（类型或通道数不一致时OpenCV会另行分配，此时再赋值回去）"""
+        resized = cv2.resize(src, (dst_view.shape[1], dst_view.shape[0]), dst=dst_view)
+        if resized is not dst_view:
+            dst_view[...] = resized
     
     @staticmethod
     def create_comparison_image(original: np.ndarray, masked: np.ndarray, 
@@ -154,24 +250,19 @@ class ImageProcessor:
         """创建对比图像"""
         try:
             target_height = 200
-            orig_resized = cv2.resize(
-                original, 
-                (int(original.shape[1] * target_height / original.shape[0]), target_height)
-            )
-            mask_resized = cv2.resize(
-                masked,
-                (int(masked.shape[1] * target_height / masked.shape[0]), target_height)
-            )
+            orig_width = int(original.shape[1] * target_height / original.shape[0])
+            mask_width = int(masked.shape[1] * target_height / masked.shape[0])
             
-            width = orig_resized.shape[1] + mask_resized.shape[1] + 20
-            comparison = np.zeros((target_height + 60, width, 3), dtype=np.uint8)
-            comparison[:] = (255, 255, 255)
+            width = orig_width + mask_width + 20
+            # 白色画布一次填充完成（不再先清零再整体赋值）
+            comparison = np.full((target_height + 60, width, 3), 255, dtype=np.uint8)
             
+            # 直接缩放到画布对应区域，省去中间缩放结果的分配和拷贝
             y_offset = 40
-            comparison[y_offset:y_offset+orig_resized.shape[0], 0:orig_resized.shape[1]] = orig_resized
+            ImageProcessor._resize_into(original, comparison[y_offset:y_offset+target_height, 0:orig_width])
             
-            x_offset = orig_resized.shape[1] + 20
-            comparison[y_offset:y_offset+mask_resized.shape[0], x_offset:x_offset+mask_resized.shape[1]] = mask_resized
+            x_offset = orig_width + 20
+            ImageProcessor._resize_into(masked, comparison[y_offset:y_offset+target_height, x_offset:x_offset+mask_width])
             
             font = cv2.FONT_HERSHEY_SIMPLEX
             cv2.putText(comparison, f"Original: {filename}", (10, 25), font, 0.6, (0, 0, 0), 2)
@@ -192,11 +283,14 @@ class TextProcessor:
     @staticmethod
     def format_amount(text: str) -> str:
         """格式化金额文本"""
+        # 短文本上连续 replace 比 str.translate 更快（translate 需逐字符查表）
         text = text.strip().replace('$', '').replace(',', '').replace(' ', '')
         
-        if 'k' in text.lower():
+        # 小写只转换一次，判断和解析共用
+        lowered = text.lower()
+        if 'k' in lowered:
             try:
-                value = float(text.lower().replace('k', ''))
+                value = float(lowered.replace('k', ''))
                 return str(int(value * 1000))
             except ValueError:
                 return text
@@ -208,6 +302,40 @@ class TextProcessor:
 # 目录管理器
 # ============================================================================
 
+@lru_cache(maxsize=4)
+def _read_matching_csv(csv_path: str, mtime: float) -> Tuple[Tuple[str, str], ...]:
+    """读取匹配结果CSV的 (原始名称, 匹配装备名称) 行（按路径和修改时间缓存，文件变化后自动重新读取）"""
+    with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return ()
+        # 列索引只解析一次，逐行按位置取值，不再为每行构建字典
+        original_idx = header.index('原始名称')
+        matched_idx = header.index('匹配装备名称')
+        min_len = max(original_idx, matched_idx) + 1
+        return tuple(
+            (row[original_idx], row[matched_idx])
+            for row in reader
+            if len(row) >= min_len and row[original_idx] and row[matched_idx]
+        )
+
+
+@lru_cache(maxsize=4096)
+def _base_name(name: str, *suffixes: str) -> str:
+    """去掉名称中的指定片段得到基础名称（驻留字符串，按名称缓存，重复批次不再重新计算）"""
+    for suffix in suffixes:
+        name = name.replace(suffix, '')
+    return sys.intern(name)
+
+
+@lru_cache(maxsize=4096)
+def _content_hash(path: str, size: int, mtime_ns: int) -> str:
+    """按文件内容计算缓存键（大小和修改时间参与缓存键，文件未变时同一次运行内不重复读取哈希）"""
+    with open(path, 'rb') as f:
+        return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+
 class CSVResultMerger:
     """CSV结果合并器类"""
 
@@ -222,77 +350,75 @@ class CSVResultMerger:
         if not matching_output_dir.exists():
             return None
 
-        # 查找匹配结果CSV文件（在output/matching目录中）
-        csv_files = list(matching_output_dir.glob("*match*.csv"))
+        # 单次 scandir 查找匹配结果CSV文件（在output/matching目录中），匹配规则与 Path.glob("*match*.csv") 一致；
+        # 修改时间取自 DirEntry（Windows上随目录枚举返回，无需逐个 stat），也不再为每个文件构造 Path
+        with os.scandir(matching_output_dir) as it:
+            csv_files = [
+                (entry.stat().st_mtime, entry.path) for entry in it
+                if fnmatch.fnmatch(entry.name, "*match*.csv")
+            ]
         if not csv_files:
             return None
 
-        # 按修改时间排序，返回最新的
-        latest_file = max(csv_files, key=lambda f: f.stat().st_mtime)
-        return latest_file
+        # 按修改时间取最新的（同时间时保留目录顺序中的第一个）
+        latest_mtime = max(mtime for mtime, _ in csv_files)
+        return Path(next(path for mtime, path in csv_files if mtime == latest_mtime))
 
     def load_matching_results(self, csv_path: Path) -> Dict[str, str]:
         """加载匹配结果"""
         matching_results = {}
 
         try:
-            with open(csv_path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    # 使用实际的CSV列名
-                    original_name = row.get('原始名称', '')
-                    matched_name = row.get('匹配装备名称', '')
-                    if original_name and matched_name:
-                        matching_results[original_name] = matched_name
+            matching_results = dict(_read_matching_csv(str(csv_path), csv_path.stat().st_mtime))
         except Exception as e:
             print(f"读取匹配结果CSV失败: {e}")
 
         return matching_results
 
     def merge_results_with_matching(self, ocr_results: List[ProcessingResult],
-                                    matching_results: Dict[str, str]) -> List[Dict]:
-        """将OCR结果与匹配结果合并"""
-        merged_results = []
+                                    matching_results: Dict[str, str]) -> Generator[Tuple, None, None]:
+        """将OCR结果与匹配结果合并（生成器，按CSV列顺序逐行产出，不构建中间字典列表）"""
+        # 匹配结果只预处理一次：基础名称 -> 装备名称 的哈希索引（同名保留第一个），
+        # 以及按原顺序保存的列表，供精确查找失败时做子串回退匹配
+        match_index = {}
+        match_bases = []
+        for original_name, equipment_name in matching_results.items():
+            # 提取原始名称中的数字部分
+            match_base_name = _base_name(original_name, '_circle', '.png')
+            match_index.setdefault(match_base_name, equipment_name)
+            match_bases.append((match_base_name, equipment_name))
 
         for ocr_result in ocr_results:
             original_filename = ocr_result.filename
 
-            # 查找对应的匹配结果
-            matched_equipment = ""
-            original_base_name = original_filename.replace('.jpg', '').replace('.png', '')
-
-            for original_name, equipment_name in matching_results.items():
-                # 提取原始名称中的数字部分
-                match_base_name = original_name.replace('_circle', '').replace('.png', '')
-                if original_base_name in match_base_name or match_base_name in original_base_name:
-                    matched_equipment = equipment_name
-                    break
-
-                # 如果数字匹配（例如01对应01_circle_xxx）
-                if original_base_name.isdigit() and match_base_name.startswith(original_base_name):
-                    matched_equipment = equipment_name
-                    break
-
-            merged_result = {
-                'original_filename': original_filename,
-                'matched_equipment': matched_equipment,
-                'recognized_text': ocr_result.recognized_text,
-                'formatted_amount': ocr_result.formatted_amount,
-                'confidence': ocr_result.confidence,
-                'status': '成功' if ocr_result.success else '失败',
-                'error_message': ocr_result.error_message
-            }
-
-            merged_results.append(merged_result)
-
-        return merged_results
+            # 查找对应的匹配结果：先精确查找（O(1)），未命中再按原规则子串匹配
+            original_base_name = _base_name(original_filename, '.jpg', '.png')
+            matched_equipment = match_index.get(original_base_name)
+
+            if matched_equipment is None:
+                matched_equipment = ""
+                for match_base_name, equipment_name in match_bases:
+                    # 子串匹配（也覆盖数字前缀的情况，例如01对应01_circle_xxx）
+                    if original_base_name in match_base_name or match_base_name in original_base_name:
+                        matched_equipment = equipment_name
+                        break
+
+            yield (
+                original_filename,
+                matched_equipment,
+                ocr_result.recognized_text,
+                ocr_result.formatted_amount,
+                ocr_result.confidence,
+                '成功' if ocr_result.success else '失败',
+                ocr_result.error_message
+            )
 
-    def save_merged_csv(self, merged_results: List[Dict]) -> Path:
-        """保存合并的CSV结果"""
+    def save_merged_csv(self, merged_rows: Iterable[Tuple]) -> Path:
+        """保存合并的CSV结果（逐行流式写入，64KB写缓冲）"""
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         csv_path = self.output_dir / f"equipment_amount_results_{timestamp}.csv"
 
-        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        with open(csv_path, 'w', newline='', encoding='utf-8', buffering=1 << 16) as f:
             writer = csv.writer(f)
 
             # 写入表头
@@ -302,16 +428,7 @@ class CSVResultMerger:
             ])
 
             # 写入数据
-            for result in merged_results:
-                writer.writerow([
-                    result['original_filename'],
-                    result['matched_equipment'],
-                    result['recognized_text'],
-                    result['formatted_amount'],
-                    result['confidence'],
-                    result['status'],
-                    result['error_message']
-                ])
+            writer.writerows(merged_rows)
 
         return csv_path
 
@@ -322,9 +439,104 @@ class CSVResultMerger:
             return
 
         image_extensions = {'.png', '.jpg', '.jpeg', '.webp'}
-        for file_path in sorted(directory.iterdir()):
-            if file_path.suffix.lower() in image_extensions:
-                yield file_path
+        # 单次 scandir 按扩展名过滤，只为命中的文件构造 Path
+        with os.scandir(directory) as it:
+            entries = [
+                entry for entry in it
+                if os.path.splitext(entry.name)[1].lower() in image_extensions and entry.is_file()
+            ]
+        entries.sort(key=lambda entry: entry.name)
+        for entry in entries:
+            yield Path(entry.path)
+
+
+# ============================================================================
+# OCR识别核心（线程与进程共用）
+# ============================================================================
+
+def create_recognizer():
+    """创建OCR识别器（导入失败时抛出ImportError）"""
+    from src.ocr.enhanced_ocr_recognizer import EnhancedOCRRecognizer
+    from src.config.ocr_config_manager import OCRConfigManager
+    from src.config.config_manager import get_config_manager
+
+    base_config_manager = get_config_manager()
+    ocr_config_manager = OCRConfigManager(base_config_manager)
+    return EnhancedOCRRecognizer(ocr_config_manager)
+
+
+def recognize_image(recognizer, image_path: Path, logger: logging.Logger,
+                    image: Optional[np.ndarray] = None, result=None) -> ProcessingResult:
+    """识别单个图像（不含缓存），image 为预取的已解码图像，result 为批量识别已得到的识别器结果"""
+    filename = image_path.name
+    try:
+        # 直接进行OCR识别，不保存任何图片
+        logger.debug("开始OCR识别: %s", image_path)
+        if result is not None:
+            pass
+        elif image is not None:
+            result = recognizer.recognize_with_fallback(str(image_path), image=image)
+        else:
+            result = recognizer.recognize_with_fallback(str(image_path))
+        # EAFP：常见的成功路径只做一次属性查找（识别器返回None或缺少字段时按空结果处理）
+        try:
+            recognized_text = result.recognized_text.strip()
+        except AttributeError:
+            recognized_text = ""
+        formatted_amount = TextProcessor.format_amount(recognized_text) if recognized_text else ""
+        confidence = getattr(result, 'confidence', 0.0)
+
+        # 如果没有识别到文本，记录为失败但不是错误
+        if not recognized_text:
+            error_msg = "OCR未识别到文本"
+            logger.warning(f"处理图像 {filename}: {error_msg}")
+            return ProcessingResult(
+                filename=filename,
+                success=False,
+                error_message=error_msg,
+                confidence=confidence
+            )
+        return ProcessingResult(
+            filename=filename,
+            success=True,
+            recognized_text=recognized_text,
+            formatted_amount=formatted_amount,
+            confidence=confidence
+        )
+
+    except Exception as e:
+        error_msg = f"{type(e).__name__}: {str(e)}"
+        logger.error(f"处理图像 {filename} 失败: {error_msg}")
+        # 仅在DEBUG级别启用时才格式化堆栈
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"处理图像 {filename} 异常堆栈", exc_info=True)
+        return ProcessingResult(filename, False, error_message=error_msg)
+
+
+# 进程池工作进程状态：每个进程只创建一次识别器（模型加载开销大），之后复用
+_worker_state: Dict = {}
+
+
+def _pool_context():
+    """返回进程池启动上下文：优先forkserver，否则spawn
+
+    不使用fork：主进程此时已加载torch等模块并运行着日志监听线程，
+    fork出的子进程可能继承被其他线程持有的锁而死锁。
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+def _init_ocr_worker(log_file: Optional[Path] = None) -> None:
+    """进程池初始化：配置本进程日志并创建识别器"""
+    _worker_state['logger'] = setup_worker_logging(log_file)
+    _worker_state['recognizer'] = create_recognizer()
+
+
+def _recognize_in_worker(image_path: Path) -> ProcessingResult:
+    """进程池任务：使用本进程的识别器识别单个图像"""
+    return recognize_image(_worker_state['recognizer'], image_path, _worker_state['logger'])
 
 
 # ============================================================================
@@ -334,21 +546,27 @@ class CSVResultMerger:
 class OCRProcessor:
     """OCR处理器主类"""
 
-    def __init__(self, output_dir: Path, logger: logging.Logger, max_workers: int = 4):
+    def __init__(self, output_dir: Path, logger: logging.Logger, max_workers: int = 4,
+                 use_processes: bool = False, log_file: Optional[Path] = None,
+                 cache_dir: Optional[Path] = None):
         self.output_dir = output_dir
         self.logger = logger
+        # 日志文件路径（进程池工作进程直接写入该文件）
+        self.log_file = log_file
         self.csv_merger = CSVResultMerger(output_dir)
         self.image_processor = ImageProcessor()
         self.text_processor = TextProcessor()
         self.max_workers = max_workers
+        # 使用进程池（每个进程各自加载OCR模型，内存占用随进程数增加）
+        self.use_processes = use_processes
 
         # 延迟导入OCR模块
         self.recognizer = None
         self.merged_csv_file = None
 
-        # 缓存设置
-        self.cache_dir = output_dir / "cache"
-        self.cache_dir.mkdir(exist_ok=True)
+        # 缓存设置（cache_dir 需位于每次运行都会清理的输出目录之外，缓存才能跨运行命中）
+        self.cache_dir = cache_dir if cache_dir is not None else output_dir / "cache"
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
         self.cache_file = self.cache_dir / "ocr_cache.pkl"
         self.result_cache = self._load_cache()
 
@@ -374,18 +592,18 @@ class OCRProcessor:
         """获取图像文件哈希值用于缓存"""
         try:
             stat = image_path.stat()
-            # 使用文件路径、大小和修改时间生成哈希
-            hash_key = f"{image_path}_{stat.st_size}_{stat.st_mtime}"
-            return hashlib.md5(hash_key.encode()).hexdigest()
+            # 使用文件内容生成哈希：步骤2每次重新生成图像（修改时间变化），内容相同仍可命中缓存
+            return _content_hash(str(image_path), stat.st_size, stat.st_mtime_ns)
         except Exception:
             return hashlib.md5(str(image_path).encode()).hexdigest()
 
     def _get_cached_result(self, image_path: Path) -> Optional[ProcessingResult]:
-        """获取缓存的识别结果"""
+        """获取缓存的识别结果（内容相同的其他文件的结果换成当前文件名）"""
         cache_key = self._get_image_hash(image_path)
-        if cache_key in self.result_cache:
-            return self.result_cache[cache_key]
-        return None
+        cached_result = self.result_cache.get(cache_key)
+        if cached_result is not None and cached_result.filename != image_path.name:
+            return replace(cached_result, filename=image_path.name)
+        return cached_result
 
     def _cache_result(self, image_path: Path, result: ProcessingResult):
         """缓存识别结果"""
@@ -395,13 +613,7 @@ class OCRProcessor:
     def initialize_ocr_modules(self) -> bool:
         """初始化OCR模块"""
         try:
-            from src.ocr.enhanced_ocr_recognizer import EnhancedOCRRecognizer
-            from src.config.ocr_config_manager import OCRConfigManager
-            from src.config.config_manager import get_config_manager
-
-            base_config_manager = get_config_manager()
-            ocr_config_manager = OCRConfigManager(base_config_manager)
-            self.recognizer = EnhancedOCRRecognizer(ocr_config_manager)
+            self.recognizer = create_recognizer()
 
             self.logger.info("OCR模块初始化成功")
             return True
@@ -413,55 +625,135 @@ class OCRProcessor:
             self.logger.error(f"初始化OCR模块失败: {e}")
             return False
     
-    def process_single_image(self, image_path: Path) -> ProcessingResult:
-        """处理单个图像（带缓存检查）"""
+    def process_single_image(self, image_path: Path, image: Optional[np.ndarray] = None) -> ProcessingResult:
+        """处理单个图像（带缓存检查），image 为预取的已解码图像"""
         filename = image_path.name
 
         # 检查缓存
         cached_result = self._get_cached_result(image_path)
         if cached_result:
-            self.logger.debug(f"使用缓存结果: {filename}")
+            self.logger.debug("使用缓存结果: %s", filename)
             return cached_result
 
+        processing_result = recognize_image(self.recognizer, image_path, self.logger, image)
+
+        # 缓存结果
+        self._cache_result(image_path, processing_result)
+        return processing_result
+
+    def _read_for_prefetch(self, image_path: Path) -> Optional[np.ndarray]:
+        """后台预取：缓存命中或读取失败时返回None（失败由识别器按原流程报告）"""
+        if self._get_cached_result(image_path):
+            return None
         try:
-            # 直接进行OCR识别，不保存任何图片
-            self.logger.debug(f"开始OCR识别: {image_path}")
-            result = self.recognizer.recognize_with_fallback(str(image_path))
-            recognized_text = result.recognized_text.strip() if result and hasattr(result, 'recognized_text') else ""
-            formatted_amount = self.text_processor.format_amount(recognized_text) if recognized_text else ""
-            confidence = result.confidence if result and hasattr(result, 'confidence') else 0.0
-
-            # 如果没有识别到文本，记录为失败但不是错误
-            if not recognized_text:
-                error_msg = "OCR未识别到文本"
-                self.logger.warning(f"处理图像 {filename}: {error_msg}")
-                processing_result = ProcessingResult(
-                    filename=filename,
-                    success=False,
-                    error_message=error_msg,
-                    confidence=confidence
-                )
-            else:
-                processing_result = ProcessingResult(
-                    filename=filename,
-                    success=True,
-                    recognized_text=recognized_text,
-                    formatted_amount=formatted_amount,
-                    confidence=confidence
-                )
-
-            # 缓存结果
-            self._cache_result(image_path, processing_result)
-            return processing_result
+            return self.recognizer.read_image(str(image_path))
+        except Exception:
+            return None
 
+    def _process_with_prefetch(self, image_files: List[Path],
+                               depth: int = 2) -> Generator[ProcessingResult, None, None]:
+        """单线程识别，同时由一个后台线程提前读取解码后续图像（磁盘IO与OCR重叠）"""
+        if not hasattr(self.recognizer, 'read_image'):
+            for path in image_files:
+                yield self.process_single_image(path)
+            return
+
+        with ThreadPoolExecutor(max_workers=1) as loader:
+            in_flight = deque()
+            paths = iter(image_files)
+            for path in paths:
+                in_flight.append((path, loader.submit(self._read_for_prefetch, path)))
+                if len(in_flight) >= depth:
+                    break
+            while in_flight:
+                path, future = in_flight.popleft()
+                for next_path in paths:
+                    in_flight.append((next_path, loader.submit(self._read_for_prefetch, next_path)))
+                    break
+                yield self.process_single_image(path, future.result())
+
+    def _recognize_chunk(self, paths: List[Path],
+                         images: List[Optional[np.ndarray]]) -> List[ProcessingResult]:
+        """一次批量调用识别器识别一组图像，批量接口出错时逐张识别"""
+        try:
+            raw_results = self.recognizer.recognize_batch([str(path) for path in paths], images)
         except Exception as e:
-            error_msg = f"{type(e).__name__}: {str(e)}"
-            self.logger.error(f"处理图像 {filename} 失败: {error_msg}")
-            import traceback
-            self.logger.debug(traceback.format_exc())
-            processing_result = ProcessingResult(filename, False, error_message=error_msg)
-            self._cache_result(image_path, processing_result)
-            return processing_result
+            self.logger.debug(f"批量识别失败，改为逐张识别: {e}")
+            return [recognize_image(self.recognizer, path, self.logger, image)
+                    for path, image in zip(paths, images)]
+        return [recognize_image(self.recognizer, path, self.logger, result=raw)
+                for path, raw in zip(paths, raw_results)]
+
+    def process_batch_images(self, image_files: List[Path],
+                             batch_size: int = 32) -> Generator[ProcessingResult, None, None]:
+        """分批识别（结果顺序与输入一致）：每批未命中缓存的图像一次交给识别器的 recognize_batch，
+        同时由后台线程预读下一批；识别器不支持批量接口时逐张识别"""
+        if not hasattr(self.recognizer, 'recognize_batch'):
+            yield from self._process_with_prefetch(image_files)
+            return
+
+        chunks = [image_files[i:i + batch_size] for i in range(0, len(image_files), batch_size)]
+        with ThreadPoolExecutor(max_workers=1) as loader:
+            def submit(chunk):
+                return [loader.submit(self._read_for_prefetch, path) for path in chunk]
+
+            next_loads = submit(chunks[0]) if chunks else []
+            for n, chunk in enumerate(chunks):
+                loads = next_loads
+                if n + 1 < len(chunks):
+                    next_loads = submit(chunks[n + 1])
+
+                cached = [self._get_cached_result(path) for path in chunk]
+                pending = [(path, load) for path, load, hit in zip(chunk, loads, cached) if not hit]
+                fresh = iter(self._recognize_chunk(
+                    [path for path, _ in pending], [load.result() for _, load in pending]
+                ) if pending else ())
+
+                for path, hit in zip(chunk, cached):
+                    if hit:
+                        self.logger.debug("使用缓存结果: %s", path.name)
+                        yield hit
+                    else:
+                        result = next(fresh)
+                        self._cache_result(path, result)
+                        yield result
+
+    def _process_with_processes(self, image_files: List[Path]) -> Generator[ProcessingResult, None, None]:
+        """使用进程池识别（结果顺序与输入一致），缓存命中的图像不进入进程池"""
+        cached = {}
+        pending = []
+        for path in image_files:
+            cached_result = self._get_cached_result(path)
+            if cached_result:
+                cached[path] = cached_result
+            else:
+                pending.append(path)
+
+        fresh = iter(())
+        executor = None
+        # 每个工作进程都要加载一次OCR模型：进程数不超过待识别图像数，
+        # 只剩一张（或只允许一个进程）时直接使用主进程已加载的识别器
+        workers = min(self.max_workers, len(pending))
+        if workers == 1 and self.recognizer is not None:
+            fresh = (recognize_image(self.recognizer, path, self.logger) for path in pending)
+        elif pending:
+            chunksize = max(1, len(pending) // (workers * 4))
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context(),
+                                           initializer=_init_ocr_worker,
+                                           initargs=(self.log_file,))
+            fresh = executor.map(_recognize_in_worker, pending, chunksize=chunksize)
+        try:
+            for path in image_files:
+                if path in cached:
+                    self.logger.debug("使用缓存结果: %s", path.name)
+                    yield cached[path]
+                else:
+                    result = next(fresh)
+                    self._cache_result(path, result)
+                    yield result
+        finally:
+            if executor is not None:
+                executor.shutdown()
     
     def process_batch(self, input_dir: Path) -> ProcessingSummary:
         """并行批量处理图像"""
@@ -473,23 +765,28 @@ class OCRProcessor:
             self.logger.warning(f"在目录 {input_dir} 中未找到图像文件")
             return ProcessingSummary(0, 0, 0, [])
 
-        print(f"\n开始并行处理 {total_files} 个图像文件（使用 {self.max_workers} 个线程）...")
+        unit = "个进程" if self.use_processes else "个线程"
+        print(f"\n开始并行处理 {total_files} 个图像文件（使用 {self.max_workers} {unit}）...")
 
         # 并行处理图像
         success_count = 0
         failed_files = []
         results_list = []
 
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # 提交所有任务
-            future_to_path = {executor.submit(self.process_single_image, path): path
-                             for path in image_files}
+        # 按输入顺序获取结果（报告和CSV顺序稳定）
+        thread_executor = None
+        if self.use_processes:
+            results_iter = self._process_with_processes(image_files)
+        elif self.max_workers <= 1:
+            results_iter = self.process_batch_images(image_files)
+        else:
+            thread_executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            results_iter = thread_executor.map(self.process_single_image, image_files)
 
-            # 处理完成的任务
-            for future in as_completed(future_to_path):
-                image_path = future_to_path[future]
+        try:
+            for idx, image_path in enumerate(image_files):
                 try:
-                    result = future.result()
+                    result = next(results_iter)
                     results_list.append(result)
 
                     if result.success:
@@ -505,6 +802,13 @@ class OCRProcessor:
                     failed_files.append((image_path.name, error_msg))
                     print(f"✗ {image_path.name}: 处理异常 - {error_msg}")
                     self.logger.error(f"处理图像 {image_path} 异常: {error_msg}")
+                    # 结果迭代器抛出异常后即终止（如工作进程崩溃），其余文件一并记为失败
+                    for rest_path in image_files[idx + 1:]:
+                        failed_files.append((rest_path.name, error_msg))
+                    break
+        finally:
+            if thread_executor is not None:
+                thread_executor.shutdown()
 
         # 保存缓存
         self._save_cache()
@@ -518,10 +822,10 @@ class OCRProcessor:
             matching_results = self.csv_merger.load_matching_results(matching_csv)
 
             print("正在合并OCR和匹配结果...")
-            merged_results = self.csv_merger.merge_results_with_matching(results_list, matching_results)
+            merged_rows = self.csv_merger.merge_results_with_matching(results_list, matching_results)
 
-            # 保存合并的CSV
-            self.merged_csv_file = self.csv_merger.save_merged_csv(merged_results)
+            # 保存合并的CSV（合并结果边生成边写入）
+            self.merged_csv_file = self.csv_merger.save_merged_csv(merged_rows)
             print(f"合并结果已保存到: {self.merged_csv_file}")
         else:
             print("警告: 未找到装备匹配结果CSV文件")
@@ -538,45 +842,49 @@ class OCRProcessor:
         report_path = output_dir / f"report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
         
         try:
-            with open(report_path, 'w', encoding='utf-8') as f:
-                f.write("=" * 80 + "\n")
-                f.write("OCR金额识别处理报告\n")
-                f.write("=" * 80 + "\n\n")
-                
-                f.write(f"生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                if self.merged_csv_file:
-                    f.write(f"合并CSV文件: {self.merged_csv_file.name}\n")
-                f.write("\n")
-                
-                f.write("=" * 80 + "\n")
-                f.write("处理摘要\n")
-                f.write("=" * 80 + "\n")
-                f.write(f"总文件数: {summary.total}\n")
-                f.write(f"成功识别: {summary.success} ({summary.success_rate:.1f}%)\n")
-                f.write(f"识别失败: {summary.failed}\n\n")
-                
-                if results:
-                    f.write("=" * 80 + "\n")
-                    f.write("详细结果\n")
-                    f.write("=" * 80 + "\n")
-                    f.write(f"{'序号':<6} {'文件名':<20} {'识别文本':<15} {'格式化金额':<15} {'置信度':<10} {'状态'}\n")
-                    f.write("-" * 80 + "\n")
-                    
-                    for idx, result in enumerate(results, 1):
-                        status = "成功" if result.success else "失败"
-                        f.write(f"{idx:<6} {result.filename:<20} {result.recognized_text:<15} "
-                               f"{result.formatted_amount:<15} {result.confidence:<10.2f} {status}\n")
-                
-                if summary.failed_files:
-                    f.write("\n" + "=" * 80 + "\n")
-                    f.write("失败文件详情\n")
-                    f.write("=" * 80 + "\n")
-                    for filename, error in summary.failed_files:
-                        f.write(f"- {filename}: {error}\n")
+            # 先在内存中拼接全部内容，再一次性写入文件
+            lines = []
+            lines.append("=" * 80 + "\n")
+            lines.append("OCR金额识别处理报告\n")
+            lines.append("=" * 80 + "\n\n")
+            
+            lines.append(f"生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            if self.merged_csv_file:
+                lines.append(f"合并CSV文件: {self.merged_csv_file.name}\n")
+            lines.append("\n")
+            
+            lines.append("=" * 80 + "\n")
+            lines.append("处理摘要\n")
+            lines.append("=" * 80 + "\n")
+            lines.append(f"总文件数: {summary.total}\n")
+            lines.append(f"成功识别: {summary.success} ({summary.success_rate:.1f}%)\n")
+            lines.append(f"识别失败: {summary.failed}\n\n")
+            
+            if results:
+                lines.append("=" * 80 + "\n")
+                lines.append("详细结果\n")
+                lines.append("=" * 80 + "\n")
+                lines.append(f"{'序号':<6} {'文件名':<20} {'识别文本':<15} {'格式化金额':<15} {'置信度':<10} {'状态'}\n")
+                lines.append("-" * 80 + "\n")
                 
-                f.write("\n" + "=" * 80 + "\n")
-                f.write("报告结束\n")
-                f.write("=" * 80 + "\n")
+                for idx, result in enumerate(results, 1):
+                    status = "成功" if result.success else "失败"
+                    lines.append(f"{idx:<6} {result.filename:<20} {result.recognized_text:<15} "
+                                 f"{result.formatted_amount:<15} {result.confidence:<10.2f} {status}\n")
+            
+            if summary.failed_files:
+                lines.append("\n" + "=" * 80 + "\n")
+                lines.append("失败文件详情\n")
+                lines.append("=" * 80 + "\n")
+                for filename, error in summary.failed_files:
+                    lines.append(f"- {filename}: {error}\n")
+            
+            lines.append("\n" + "=" * 80 + "\n")
+            lines.append("报告结束\n")
+            lines.append("=" * 80 + "\n")
+            
+            with open(report_path, 'w', encoding='utf-8') as f:
+                f.write("".join(lines))
             
             self.logger.info(f"报告已生成: {report_path}")
             print(f"\n报告已生成: {report_path}")
@@ -593,7 +901,8 @@ def process_amount_images(input_dir: Optional[str] = None,
                          output_dir: Optional[str] = None,
                          auto_clean: bool = True,
                          max_workers: int = 4,
-                         disable_cache: bool = False) -> bool:
+                         disable_cache: bool = False,
+                         use_processes: bool = False) -> bool:
     """
     处理金额图片
 
@@ -601,6 +910,7 @@ def process_amount_images(input_dir: Optional[str] = None,
         input_dir: 输入目录路径，默认为 '../output_enter_image/equipment_crop'
         output_dir: 输出目录路径，默认为 '../output/ocr'
         auto_clean: 是否自动清理输出目录
+        use_processes: 是否使用进程池（每个进程各自加载OCR模型）代替线程池
 
     Returns:
         bool: 处理是否成功
@@ -662,7 +972,10 @@ def process_amount_images(input_dir: Optional[str] = None,
     print(f"日志文件: {log_file}")
     
     # 初始化处理器（使用指定数量的并发线程）
-    processor = OCRProcessor(output_path, logger, max_workers=max_workers)
+    # 识别结果缓存放在输出目录之外（auto_clean 会删除整个输出目录）
+    processor = OCRProcessor(output_path, logger, max_workers=max_workers,
+                             use_processes=use_processes, log_file=log_file,
+                             cache_dir=project_root / "output_enter_image" / "ocr_cache")
 
     # 如果禁用缓存，清空缓存
     if disable_cache: